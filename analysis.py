@@ -0,0 +1,221 @@
+"""数字化转型指数的批量分析，不依赖 Streamlit。
+
+数据集加载等逻辑由看板和命令行共用，各类列的识别结果来自数据源清单（schema_inspector）。
+命令行把数据按企业分块，用进程池并行计算企业指数汇总、企业关键词词频和地区汇总，
+结果写为列式文件，并输出各阶段耗时和吞吐量：
+
+    python analysis.py --workers 4 --output-dir analysis_output
+
+每家企业的全部记录都在同一个块中，各块结果按股票代码顺序合并，地区汇总由按
+(股票代码, 地区) 的部分和统一归并，因此并行结果与单进程（--workers 1）完全一致。
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from data_cache import HAS_PYARROW, read_cached_workbook, read_text_store, write_frame
+from dataset_store import read_cached_dataset, read_dataset_text
+from keyword_engine import VOCABULARY_CLASSIFICATION, get_matcher
+from schema_inspector import load_manifest
+from stock_index import StockIndex
+
+DATA_FILE = '两版合并后的年报数据_完整版.xlsx'
+# 多批次数据（多个工作簿或CSV）放在该目录下时，按目录整体加载为按年份分区的数据集
+DATA_DIR = '年报数据'
+
+# 每个任务块包含的企业数
+CHUNK_COMPANIES = 500
+
+
+def default_source():
+    return DATA_DIR if os.path.isdir(DATA_DIR) else DATA_FILE
+
+
+def load_dataset(source):
+    """读取单个工作簿或数据目录的常驻主表，返回 (DataFrame, 缓存元数据)。"""
+    if os.path.isdir(source):
+        return read_cached_dataset(source)
+    return read_cached_workbook(source)
+
+
+def read_text_frame(df, meta, source, text_col):
+    """长文本列不在常驻主表中，需要时才从文本缓存读取（股票代码、年份、文本列）。"""
+    if text_col in df.columns:
+        return df[['股票代码', '年份', text_col]]
+    if os.path.isdir(source):
+        return read_dataset_text(source, meta, [text_col])
+    return read_text_store(source, meta, [text_col])
+
+
+def company_indices(chunk, index_columns):
+    """每家企业的年份范围，以及各指数列的平均值、最小值、最大值和最新值。"""
+    grouped = chunk.groupby('股票代码', observed=True, sort=True)
+    result = pd.DataFrame({
+        '企业名称': grouped['企业名称'].last(),
+        '起始年份': grouped['年份'].min(),
+        '最新年份': grouped['年份'].max(),
+        '年份数': grouped['年份'].nunique(),
+    })
+    for col in index_columns:
+        stats = grouped[col].agg(['mean', 'min', 'max', 'last'])
+        stats.columns = [f'{col}平均值', f'{col}最小值', f'{col}最大值', f'{col}最新值']
+        result = result.join(stats)
+    return result
+
+
+def company_keywords(chunk, text_col, classification=VOCABULARY_CLASSIFICATION):
+    """每家企业全部年份文本的类别词频合计。"""
+    texts = chunk[['股票代码', text_col]].dropna(subset=[text_col])
+    counts = get_matcher(classification).count_series(texts[text_col])
+    return counts.groupby(texts['股票代码'], observed=True, sort=True).sum()
+
+
+def region_parts(chunk, region_col, index_col):
+    """按 (股票代码, 地区) 的部分统计，合并后得到地区汇总。"""
+    return chunk.groupby(['股票代码', region_col], observed=True, sort=True)[index_col].agg(['count', 'sum', 'min', 'max'])
+
+
+def analyze_chunk(chunk, index_columns, region_col=None, text_col=None, classification=VOCABULARY_CLASSIFICATION):
+    return {
+        'companies': company_indices(chunk, index_columns),
+        'keywords': company_keywords(chunk, text_col, classification) if text_col else None,
+        'regions': region_parts(chunk, region_col, index_columns[0]) if region_col else None,
+    }
+
+
+def combine_region_parts(parts, region_col):
+    # 列名与统计快照中的地区统计一致
+    parts = parts.reset_index()
+    grouped = parts.groupby(region_col, observed=True, sort=True)
+    region_stats = pd.DataFrame({
+        '企业数量': grouped['股票代码'].nunique(),
+        '平均指数': grouped['sum'].sum() / grouped['count'].sum().replace(0, np.nan),
+        '最低指数': grouped['min'].min(),
+        '最高指数': grouped['max'].max(),
+        '数据条数': grouped['count'].sum(),
+    })
+    return region_stats.reset_index()
+
+
+def _plain(frame):
+    # 输出文件不保留 category 类型，便于其他工具读取
+    frame = frame.reset_index() if frame.index.name else frame
+    for col in frame.columns:
+        if isinstance(frame[col].dtype, pd.CategoricalDtype):
+            frame[col] = frame[col].astype(frame[col].cat.categories.dtype)
+    return frame
+
+
+def combine_results(results, region_col=None):
+    combined = {'companies': _plain(pd.concat([result['companies'] for result in results]))}
+    if results and results[0]['keywords'] is not None:
+        combined['keywords'] = _plain(pd.concat([result['keywords'] for result in results]))
+    if results and results[0]['regions'] is not None:
+        parts = pd.concat([result['regions'] for result in results])
+        combined['regions'] = _plain(combine_region_parts(parts, region_col))
+    return combined
+
+
+def company_chunks(df, chunk_companies=CHUNK_COMPANIES):
+    """按 (股票代码, 年份) 排序后按企业切块，每块包含完整的若干家企业。"""
+    stock_index = StockIndex(df)
+    codes = stock_index.codes
+    for i in range(0, len(codes), chunk_companies):
+        start = stock_index.offsets[codes[i]][0]
+        stop = stock_index.offsets[codes[min(i + chunk_companies, len(codes)) - 1]][1]
+        yield stock_index.frame.iloc[start:stop]
+
+
+def run_analysis(df, index_columns, region_col=None, text_col=None, workers=1, chunk_companies=CHUNK_COMPANIES):
+    """计算企业指数汇总、企业词频和地区汇总；workers 大于 1 时使用进程池。"""
+    chunks = list(company_chunks(df, chunk_companies))
+    task = partial(analyze_chunk, index_columns=list(index_columns), region_col=region_col, text_col=text_col)
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(task, chunks))
+    else:
+        results = [task(chunk) for chunk in chunks]
+    return combine_results(results, region_col)
+
+
+def write_outputs(outputs, output_dir):
+    """每类结果写为一个列式文件（有 pyarrow 时为 Parquet），返回写出的路径。"""
+    suffix = '.parquet' if HAS_PYARROW else '.npz'
+    paths = []
+    for name, frame in outputs.items():
+        path = os.path.join(output_dir, f'{name}{suffix}')
+        write_frame(frame, path)
+        paths.append(path)
+    return paths
+
+
+def results_equal(left, right):
+    if left.keys() != right.keys():
+        return False
+    try:
+        for name in left:
+            pd.testing.assert_frame_equal(left[name], right[name], check_exact=True)
+    except AssertionError:
+        return False
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='批量计算企业指数汇总、关键词词频和地区汇总')
+    parser.add_argument('--source', default=None, help='工作簿或数据目录（默认与看板相同）')
+    parser.add_argument('--output-dir', default='analysis_output')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-companies', type=int, default=CHUNK_COMPANIES)
+    parser.add_argument('--verify', action='store_true', help='同时以单进程计算并核对结果是否一致')
+    args = parser.parse_args(argv)
+
+    source = args.source or default_source()
+    started = time.perf_counter()
+    df, meta = load_dataset(source)
+    manifest = load_manifest(source)
+    if manifest['missing_required']:
+        print(f"缺少必要的列: {', '.join(manifest['missing_required'])}", file=sys.stderr)
+        return 1
+    columns = manifest['roles']
+    if not columns['index_columns']:
+        print("未找到包含'数字化'、'转型'或'指数'的列", file=sys.stderr)
+        return 1
+    text_col = columns['text_col']
+    if text_col and text_col not in df.columns:
+        df = df.merge(read_text_frame(df, meta, source, text_col), on=['股票代码', '年份'], how='left')
+    loaded = time.perf_counter()
+
+    outputs = run_analysis(df, columns['index_columns'], columns['region_col'], text_col,
+                           workers=args.workers, chunk_companies=args.chunk_companies)
+    analyzed = time.perf_counter()
+    paths = write_outputs(outputs, args.output_dir)
+    written = time.perf_counter()
+
+    elapsed = analyzed - loaded
+    company_count = len(outputs['companies'])
+    print(f"数据: {source}  记录数: {len(df)}  企业数: {company_count}  进程数: {args.workers}")
+    print(f"加载 {loaded - started:.2f}s  分析 {elapsed:.2f}s  写出 {written - analyzed:.2f}s")
+    if elapsed > 0:
+        print(f"吞吐量: {len(df) / elapsed:,.0f} 条/秒  {company_count / elapsed:,.0f} 家企业/秒")
+    for path in paths:
+        print(f"已写出 {path}")
+
+    if args.verify:
+        # 单进程、整表一个块重新计算一遍
+        single = run_analysis(df, columns['index_columns'], columns['region_col'], text_col,
+                              workers=1, chunk_companies=max(company_count, 1))
+        if not results_equal(outputs, single):
+            print('并行结果与单进程结果不一致', file=sys.stderr)
+            return 1
+        print('并行结果与单进程结果一致')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
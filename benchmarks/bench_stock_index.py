@@ -0,0 +1,68 @@
+"""股票代码查询延迟基准：布尔过滤 vs StockIndex。
+
+用 synthetic_data.py 按当前数据规模（约 6000 家企业 × 25 年）生成合成数据（不含文本列），
+分别在 1×、10×、100× 规模下测量企业历年数据查询和 (股票代码, 年份) 单行查询的延迟。
+
+用法: python benchmarks/bench_stock_index.py [--scales 1 10 100] [--lookups 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stock_index import StockIndex  # noqa: E402
+from synthetic_data import make_annual_reports  # noqa: E402
+
+
+def median_latency_us(func, args_list):
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1e6
+
+
+def run(scales, lookups):
+    rng = np.random.default_rng(1)
+    rows = []
+    for scale in scales:
+        df = make_annual_reports(scale, text_length=0)
+        start = time.perf_counter()
+        index = StockIndex(df)
+        build_s = time.perf_counter() - start
+
+        picks = rng.integers(0, len(df), lookups)
+        queries = list(zip(df['股票代码'].to_numpy()[picks].tolist(), df['年份'].to_numpy()[picks].tolist()))
+
+        def scan_history(code):
+            return df[df['股票代码'] == code].sort_values('年份')
+
+        def scan_row(code, year):
+            stock_data = df[df['股票代码'] == code]
+            return stock_data[stock_data['年份'] == year]
+
+        rows.append({
+            '规模': f'{scale}x',
+            '行数': len(df),
+            '索引构建(s)': round(build_s, 3),
+            '过滤-历年(us)': round(median_latency_us(scan_history, [(c,) for c, _ in queries])),
+            '索引-历年(us)': round(median_latency_us(index.history, [(c,) for c, _ in queries])),
+            '过滤-单行(us)': round(median_latency_us(scan_row, queries)),
+            '索引-单行(us)': round(median_latency_us(index.row, queries)),
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='股票代码查询延迟基准')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+    print(run(args.scales, args.lookups).to_string(index=False))
@@ -0,0 +1,198 @@
+"""热更新增量结果的回归检查。
+
+用合成数据写出工作簿（以及按年份分区的数据目录），先在当前版本上构建各派生数据，
+再依次修改、新增和删除若干行（含整家企业迁移地区、更换行业、新增企业、新增和删除整个年份）并重新加载，
+逐项断言增量更新得到的统计快照、排名、企业对比矩阵、趋势指标和词频索引与在新数据上全量重新计算的结果一致。
+数据目录的统计快照按分区计算，另与常驻主表上的计算结果在 float32 精度内比较，并抽查按分区读取的企业历年数据。
+任何一项不一致时以非零状态退出。
+
+用法: python benchmarks/check_hot_reload.py [--scale 0.05] [--seed 0]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analysis import load_dataset  # noqa: E402
+from data_stats import compute_statistics, compute_store_statistics  # noqa: E402
+from hot_reload import DatasetVersion, DatasetWatcher  # noqa: E402
+from keyword_index import build_keyword_index  # noqa: E402
+from synthetic_data import make_annual_reports, write_dataset  # noqa: E402
+
+CORR_TOLERANCE = 1e-9
+# 常驻主表的数值列压缩为 float32，按分区计算（原始精度）的结果与之比较时的相对误差
+COMPACT_TOLERANCE = 1e-5
+
+
+def write_source(df, source):
+    # 数据目录先清空，删除的年份不留下旧分区
+    if os.path.isdir(source):
+        shutil.rmtree(source)
+    write_dataset(df, source)
+
+
+def change_rows(df, rng, roles):
+    """修改部分行的指数和文本，把一家企业整体迁到另一个地区。"""
+    df = df.copy()
+    index_col, region_col, text_col = roles['index_columns'][0], roles['region_col'], roles['text_col']
+    rows = rng.choice(len(df), max(1, len(df) // 100), replace=False)
+    df.loc[df.index[rows], index_col] = df[index_col].iloc[rows].fillna(0) + 5
+    rows = rng.choice(len(df), 3, replace=False)
+    df.loc[df.index[rows], text_col] = '人工智能云计算大数据区块链'
+    code = rng.choice(df['股票代码'].unique())
+    other = df.loc[df['股票代码'] != code, region_col].iloc[0]
+    df.loc[df['股票代码'] == code, region_col] = other
+    return df
+
+
+def add_and_drop_rows(df, rng, roles):
+    """删除若干行和一整家企业，新增一家企业，并给部分企业加上下一个年份。"""
+    codes = df['股票代码'].unique()
+    dropped_code = rng.choice(codes)
+    df = df[df['股票代码'] != dropped_code]
+    df = df.drop(df.index[rng.choice(len(df), 5, replace=False)])
+
+    new_company = df[df['股票代码'] == rng.choice(codes)].copy()
+    new_company['股票代码'] = int(codes.max()) + 1
+    new_company['企业名称'] = '新增测试企业'
+    latest = df[df['年份'] == df['年份'].max()]
+    next_year = latest.iloc[rng.choice(len(latest), min(10, len(latest)), replace=False)].copy()
+    next_year['年份'] += 1
+    next_year[roles['index_columns'][0]] += 1
+    return pd.concat([df, new_company, next_year], ignore_index=True)
+
+
+def reshape_rows(df, rng, roles):
+    """一家企业更换行业，并删除最早的整个年份。"""
+    df = df.copy()
+    industry_col = roles['industry_col']
+    code = rng.choice(df['股票代码'].unique())
+    other = df.loc[df['股票代码'] != code, industry_col].iloc[0]
+    df.loc[df['股票代码'] == code, industry_col] = other
+    return df[df['年份'] != df['年份'].min()].reset_index(drop=True)
+
+
+STEPS = [('修改行', change_rows), ('新增和删除行', add_and_drop_rows), ('更换行业并删除年份', reshape_rows)]
+
+
+def derive_all(dataset, roles):
+    index_columns = tuple(roles['index_columns'])
+    index_col, region_col, industry_col = index_columns[0], roles['region_col'], roles['industry_col']
+    dataset.derived('statistics', index_columns, region_col)
+    dataset.derived('rankings', index_col, industry_col, region_col)
+    dataset.derived('trends', index_columns, index_col)
+    dataset.derived('search_index')
+    dataset.derived('keyword_index', roles['text_col'])
+
+
+def check_statistics(snapshot, expected, region_col, rtol=0.0):
+    """断言统计快照一致；rtol 大于 0 时数值在该相对误差内即可。"""
+    assert snapshot['record_count'] == expected['record_count']
+    assert snapshot['company_count'] == expected['company_count']
+    assert snapshot['years'] == expected['years']
+    exact = rtol == 0
+    pd.testing.assert_frame_equal(snapshot['index_stats'], expected['index_stats'], check_dtype=exact,
+                                  check_exact=exact, rtol=rtol)
+    # 增量更新的地区统计按地区名排序、地区列为字符串
+    region_stats = expected['region_stats'].copy()
+    region_stats[region_col] = region_stats[region_col].astype(str)
+    region_stats = region_stats.sort_values(region_col).reset_index(drop=True)
+    pd.testing.assert_frame_equal(snapshot['region_stats'].reset_index(drop=True), region_stats, check_dtype=False,
+                                  check_exact=exact, rtol=rtol)
+    corr, expected_corr = snapshot['corr_matrix'], expected['corr_matrix']
+    assert list(corr.columns) == list(expected_corr.columns)
+    np.testing.assert_allclose(corr.to_numpy(), expected_corr.to_numpy(), rtol=0,
+                               atol=CORR_TOLERANCE if exact else COMPACT_TOLERANCE)
+
+
+def check_history(dataset, samples=5):
+    """抽查按分区读取的企业历年数据与常驻主表中的一致。"""
+    stock_index = dataset.derived('stock_index')
+    for code in stock_index.codes[::max(1, len(stock_index.codes) // samples)]:
+        expected = dataset.df[dataset.df['股票代码'] == code].sort_values('年份').reset_index(drop=True)
+        pd.testing.assert_frame_equal(stock_index.history(code), expected)
+
+
+def check_version(dataset, roles):
+    """断言 dataset 上增量更新得到的派生数据与全量重新计算一致。"""
+    index_columns = tuple(roles['index_columns'])
+    index_col, region_col, industry_col = index_columns[0], roles['region_col'], roles['industry_col']
+    text_col = roles['text_col']
+    expected_keys = [('statistics', index_columns, region_col), ('rankings', index_col, industry_col, region_col),
+                     ('company_pivot', index_columns), ('trends', index_columns, index_col),
+                     ('keyword_index', text_col)]
+    missing = [key for key in expected_keys if key not in dataset._values]
+    assert not missing, f'以下派生数据没有被增量更新: {missing}'
+    fresh = DatasetVersion(dataset.source, dataset.df, dataset.meta, dataset.manifest)
+
+    snapshot = dataset.derived('statistics', index_columns, region_col)
+    if dataset.store is not None:
+        check_statistics(snapshot, compute_store_statistics(dataset.store, index_columns, region_col), region_col)
+        check_statistics(snapshot, compute_statistics(dataset.df, index_columns, region_col), region_col,
+                         rtol=COMPACT_TOLERANCE)
+        check_history(dataset)
+    else:
+        check_statistics(snapshot, compute_statistics(dataset.df, index_columns, region_col), region_col)
+
+    pd.testing.assert_frame_equal(dataset.derived('rankings', index_col, industry_col, region_col),
+                                  fresh.derived('rankings', index_col, industry_col, region_col))
+
+    pivot, expected_pivot = dataset.derived('company_pivot', index_columns), fresh.derived('company_pivot', index_columns)
+    assert pivot.codes == expected_pivot.codes and pivot.years == expected_pivot.years
+    assert pivot.names == expected_pivot.names
+    for col in index_columns:
+        np.testing.assert_array_equal(pivot.matrices[col], expected_pivot.matrices[col])
+
+    pd.testing.assert_frame_equal(dataset.derived('trends', index_columns, index_col).summary,
+                                  fresh.derived('trends', index_columns, index_col).summary)
+
+    keyword_index = dataset.derived('keyword_index', text_col)
+    expected_index = build_keyword_index(fresh.derived('text_frame', text_col), text_col)
+    pd.testing.assert_frame_equal(keyword_index.keys, expected_index.keys)
+    pd.testing.assert_frame_equal(keyword_index.terms, expected_index.terms)
+    return keyword_index.recomputed
+
+
+def check_source(df, source, seed):
+    rng = np.random.default_rng(seed)
+    write_source(df, source)
+    watcher = DatasetWatcher(source, load_dataset, interval=3600)
+    try:
+        roles = watcher.current.manifest['roles']
+        derive_all(watcher.current, roles)
+        for name, step in STEPS:
+            df = step(df, rng, roles)
+            write_source(df, source)
+            assert watcher.reload(), f'{name}: 没有切换到新版本（{watcher.error!r}）'
+            diff = watcher.last_diff
+            assert diff is not None, f'{name}: 列结构意外变化'
+            recomputed = check_version(watcher.current, roles)
+            print(f'  {name}: 新增 {len(diff.added)} 行，删除 {len(diff.removed)} 行，修改 {len(diff.changed)} 行，'
+                  f'词频重新统计 {recomputed} 行，与全量重新计算一致')
+    finally:
+        watcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检查热更新的增量结果与全量重新计算一致')
+    parser.add_argument('--scale', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = make_annual_reports(args.scale, seed=args.seed, text_length=60)
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, source in [('工作簿', os.path.join(tmp, 'reports.xlsx')), ('数据目录', os.path.join(tmp, 'reports'))]:
+            print(f'{label}（{len(df)} 行）:')
+            check_source(df, source, args.seed)
+    print('全部一致')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""基准测试套件。
+
+基于合成数据（benchmarks/synthetic_data.py）测量：
+- 数据加载：直接解析工作簿、列式缓存冷启动/命中、数据目录的分区存储构建/命中；
+- 按企业查询：布尔过滤 vs StockIndex，侧边栏企业搜索索引的构建和查询；
+- 关键词词频统计吞吐量（MB/s）：逐条 count_word_frequency 与批量 count_series；
+- 分组统计与相关系数：全局统计快照、按年份分组、相关系数矩阵、相关系数引擎（全量与增量）、各数值列的直方图和核密度、企业趋势指标；
+- 看板整体：用 Streamlit AppTest 测量脚本首次运行、重跑和切换各标签页的耗时。
+
+结果写为 JSON（含提交号和运行环境），可用 --compare 与其他提交的结果对比。
+
+用法: python benchmarks/run_benchmarks.py [--scales 1 10] [--output 结果.json] [--compare 基线.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analysis import DATA_FILE  # noqa: E402
+from data_cache import read_cached_workbook  # noqa: E402
+from company_pivot import CompanyPivot  # noqa: E402
+from correlation import analysis_columns, build_correlation_engine  # noqa: E402
+from data_compact import compact_frame  # noqa: E402
+from data_stats import compute_statistics  # noqa: E402
+from dataset_store import build_store, read_cached_dataset  # noqa: E402
+from distribution import compute_distributions  # noqa: E402
+from keyword_engine import count_word_frequency, get_matcher  # noqa: E402
+from search_index import build_search_index  # noqa: E402
+from stock_index import StockIndex  # noqa: E402
+from trends import CompanyTrends  # noqa: E402
+from synthetic_data import EXCEL_MAX_ROWS, make_annual_reports, write_dataset  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, 'digital_transformation_app.py')
+APP_TABS = ['统计概览', '相关性与分布', '地理分布', '企业查询', '词频分析']
+INDEX_COLUMNS = ['数字化转型指数']
+
+
+def median_seconds(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def seconds(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+class Recorder:
+    def __init__(self):
+        self.results = []
+
+    def add(self, benchmark, scale, metric, value, unit):
+        self.results.append({'benchmark': benchmark, 'scale': scale, 'metric': metric,
+                             'value': round(float(value), 6), 'unit': unit})
+        print(f'  {benchmark:<10} {scale:>5}x  {metric:<28} {value:>12.4f} {unit}')
+
+
+def bench_load(recorder, df, scale, workdir, max_excel_scale):
+    if scale <= max_excel_scale and len(df) < EXCEL_MAX_ROWS:
+        workbook = os.path.join(workdir, DATA_FILE)
+        write_dataset(df, workbook)
+        cache_dir = os.path.join(workdir, '.cache')
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        recorder.add('load', scale, 'read_excel', seconds(lambda: pd.read_excel(workbook)), 's')
+        recorder.add('load', scale, 'workbook_cache_cold', seconds(lambda: read_cached_workbook(workbook)), 's')
+        recorder.add('load', scale, 'workbook_cache_warm', median_seconds(lambda: read_cached_workbook(workbook)), 's')
+
+    # 数据目录（按年份拆分的 CSV）走分区存储
+    data_dir = os.path.join(workdir, '年报数据')
+    write_dataset(df, data_dir)
+    recorder.add('load', scale, 'store_build', seconds(lambda: build_store(data_dir)), 's')
+    recorder.add('load', scale, 'store_warm', median_seconds(lambda: read_cached_dataset(data_dir)), 's')
+
+
+def bench_lookup(recorder, df, scale, lookups):
+    hot, _, _ = compact_frame(df)
+    rng = np.random.default_rng(1)
+    codes = hot['股票代码'].to_numpy()[rng.integers(0, len(hot), lookups)].tolist()
+    recorder.add('lookup', scale, 'index_build', seconds(lambda: StockIndex(hot)), 's')
+    index = StockIndex(hot)
+
+    def scan():
+        for code in codes:
+            hot[hot['股票代码'] == code].sort_values('年份')
+
+    def indexed():
+        for code in codes:
+            index.history(code)
+
+    recorder.add('lookup', scale, 'filter_history', seconds(scan) / lookups * 1e6, 'us')
+    recorder.add('lookup', scale, 'index_history', seconds(indexed) / lookups * 1e6, 'us')
+
+    # 侧边栏企业搜索：按代码前缀和名称片段各查询一次
+    recorder.add('lookup', scale, 'search_index_build', seconds(lambda: build_search_index(index)), 's')
+    search_index = build_search_index(index)
+    queries = [str(code)[:3] for code in codes] + [search_index.names.get(code, '')[1:3] for code in codes]
+
+    def search():
+        for query in queries:
+            search_index.search(query)
+
+    recorder.add('lookup', scale, 'search_query', seconds(search) / len(queries) * 1e6, 'us')
+
+
+def bench_keywords(recorder, df, scale, sample_rows):
+    texts = df['年报内容'].dropna().iloc[:sample_rows]
+    megabytes = texts.str.encode('utf-8').str.len().sum() / 2**20
+    matcher = get_matcher()
+
+    def per_text():
+        for text in texts:
+            count_word_frequency(text)
+
+    recorder.add('keywords', scale, 'count_word_frequency', megabytes / seconds(per_text), 'MB/s')
+    recorder.add('keywords', scale, 'count_series', megabytes / seconds(lambda: matcher.count_series(texts)), 'MB/s')
+
+
+def bench_stats(recorder, df, scale):
+    hot, _, _ = compact_frame(df)
+    numeric = hot.select_dtypes(include=[np.number])
+    recorder.add('stats', scale, 'compute_statistics',
+                 seconds(lambda: compute_statistics(hot, INDEX_COLUMNS, '所属地区')), 's')
+    recorder.add('stats', scale, 'groupby_year_mean',
+                 median_seconds(lambda: hot.groupby('年份')[INDEX_COLUMNS].mean()), 's')
+    recorder.add('stats', scale, 'groupby_region_agg',
+                 median_seconds(lambda: hot.groupby('所属地区', observed=True)['数字化转型指数'].agg(['mean', 'min', 'max', 'count'])), 's')
+    value_columns = analysis_columns(INDEX_COLUMNS, numeric.columns)
+    recorder.add('stats', scale, 'corr_matrix', median_seconds(numeric.corr), 's')
+    recorder.add('stats', scale, 'correlation_engine',
+                 median_seconds(lambda: build_correlation_engine(hot, value_columns)), 's')
+    # 新增一个年份后基于上一版本增量更新
+    previous = build_correlation_engine(hot[hot['年份'] < hot['年份'].max()], value_columns)
+    recorder.add('stats', scale, 'correlation_incremental',
+                 median_seconds(lambda: build_correlation_engine(hot, value_columns, previous)), 's')
+    recorder.add('stats', scale, 'distributions', median_seconds(lambda: compute_distributions(hot, value_columns)), 's')
+    pivot = CompanyPivot(StockIndex(hot), INDEX_COLUMNS)
+    recorder.add('stats', scale, 'company_trends', median_seconds(lambda: CompanyTrends(pivot, INDEX_COLUMNS[0])), 's')
+
+
+def bench_app(recorder, df, scale, workdir, reruns):
+    from streamlit.testing.v1 import AppTest
+
+    workbook = os.path.join(workdir, DATA_FILE)
+    if not os.path.exists(workbook):
+        write_dataset(df, workbook)
+    shutil.rmtree(os.path.join(workdir, '.cache'), ignore_errors=True)
+    shutil.rmtree(os.path.join(workdir, '年报数据'), ignore_errors=True)
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        app = AppTest.from_file(APP_PATH, default_timeout=600)
+        recorder.add('app', scale, 'first_run', seconds(app.run), 's')
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+        recorder.add('app', scale, 'rerun', median_seconds(app.run, reruns), 's')
+        for tab in APP_TABS:
+            app.session_state['main_tabs'] = tab
+            # 首次打开标签页包含生成图表等一次性开销，这里取之后重跑的耗时
+            app.run()
+            recorder.add('app', scale, f'rerun_{tab}', median_seconds(app.run, reruns), 's')
+    finally:
+        os.chdir(cwd)
+
+
+def environment():
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'commit': git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    old = {(row['benchmark'], row['scale'], row['metric']): row['value'] for row in baseline['results']}
+    rows = []
+    for row in results:
+        key = (row['benchmark'], row['scale'], row['metric'])
+        if key in old and old[key]:
+            rows.append({'基准': row['benchmark'], '规模': row['scale'], '指标': row['metric'], '单位': row['unit'],
+                         '基线': old[key], '当前': row['value'], '当前/基线': round(row['value'] / old[key], 3)})
+    print(f"\n与 {baseline['environment'].get('commit')} 的对比（耗时类指标比值小于 1 更快，MB/s 大于 1 更快）:")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='基准测试套件')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10])
+    parser.add_argument('--max-excel-scale', type=float, default=1, help='超过该规模时不生成 .xlsx（写工作簿很慢）')
+    parser.add_argument('--app-scale', type=float, default=1, help='AppTest 使用的规模，0 表示跳过')
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--keyword-rows', type=int, default=5000)
+    parser.add_argument('--reruns', type=int, default=5)
+    parser.add_argument('--only', nargs='+', choices=['load', 'lookup', 'keywords', 'stats', 'app'])
+    parser.add_argument('--output', default=None, help='结果 JSON 路径，默认 benchmarks/results/<提交号>.json')
+    parser.add_argument('--compare', default=None, help='与之前的结果 JSON 对比')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+    selected = set(args.only or ['load', 'lookup', 'keywords', 'stats', 'app'])
+    recorder = Recorder()
+    scales = sorted(set(args.scales) | ({args.app_scale} if args.app_scale and 'app' in selected else set()))
+
+    for scale in scales:
+        scale = int(scale) if float(scale).is_integer() else scale
+        df = make_annual_reports(scale)
+        print(f'规模 {scale}x: {len(df)} 行')
+        workdir = tempfile.mkdtemp(prefix=f'bench-{scale}x-')
+        try:
+            if scale in args.scales:
+                if 'load' in selected:
+                    bench_load(recorder, df, scale, workdir, args.max_excel_scale)
+                if 'lookup' in selected:
+                    bench_lookup(recorder, df, scale, args.lookups)
+                if 'keywords' in selected:
+                    bench_keywords(recorder, df, scale, args.keyword_rows)
+                if 'stats' in selected:
+                    bench_stats(recorder, df, scale)
+            if 'app' in selected and scale == args.app_scale:
+                bench_app(recorder, df, scale, workdir, args.reruns)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'environment': environment(), 'results': recorder.results}
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"{report['environment']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'\n结果已写入 {output}')
+
+    if args.compare:
+        compare(recorder.results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
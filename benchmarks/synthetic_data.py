@@ -0,0 +1,136 @@
+"""合成年报数据生成器。
+
+生成与原始工作簿结构相同的数据：股票代码、企业名称、年份、五类词频数、技术维度、应用维度、
+词总、数字化转型指数，另加 所属地区、所属行业 和长文本 年报内容。
+1× 约为当前规模（约 6000 家企业 × 25 年，每家企业随机缺失部分年份），可放大到 100×。
+同一 scale 和 seed 生成的数据完全相同。
+
+用法: python benchmarks/synthetic_data.py --scale 1 --output 合成数据.xlsx
+      （输出为 .csv 时不受工作簿行数上限限制；输出为目录时按年份拆成多个 CSV）
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from region_geo import CITY_CENTROIDS, PROVINCE_CENTROIDS  # noqa: E402
+
+BASE_COMPANIES = 6000
+YEARS = list(range(1999, 2024))
+# 原始工作簿中约 42% 的 (企业, 年份) 组合有记录
+KEEP_RATIO = 0.42
+# 数字化转型指数缺失的比例
+MISSING_INDEX_RATIO = 0.11
+# Excel 单个工作表的最大行数（含表头）
+EXCEL_MAX_ROWS = 1048576
+
+INDUSTRIES = ['制造业', '信息技术', '金融业', '批发和零售业', '房地产业', '交通运输', '电力热力',
+              '采矿业', '建筑业', '文化体育', '科学研究', '医药生物']
+NAME_HEADS = ['华', '中', '东方', '长江', '海', '金', '新', '天', '恒', '国', '宏', '远', '盛', '瑞', '鼎']
+NAME_TAILS = ['科技', '股份', '电子', '实业', '控股', '集团', '智能', '信息', '医药', '能源']
+# 年报文本片段：普通叙述和五类数字技术关键词
+FILLER_PHRASES = ['公司经营稳健发展', '报告期内', '营业收入同比增长', '持续加大研发投入', '完善公司治理结构',
+                  '积极拓展市场', '提升核心竞争力', '加强风险管理', '优化产品结构', '推进降本增效']
+KEYWORD_PHRASES = ['人工智能', '机器学习', '深度学习', '大数据', '数据挖掘', '云计算', '云平台', '区块链',
+                   '数字货币', '物联网', '电子商务', '移动互联网', '工业互联网', '智能制造', 'AI']
+
+
+def _company_names(rng, n_companies):
+    heads = rng.choice(NAME_HEADS, n_companies)
+    middles = rng.choice(NAME_HEADS, n_companies)
+    tails = rng.choice(NAME_TAILS, n_companies)
+    return pd.Series(heads, dtype=object) + pd.Series(middles, dtype=object) + pd.Series(tails, dtype=object)
+
+
+def _regions(rng, n_companies):
+    # 地区写法混合省份、带“省/市”后缀和城市名，与实际数据的不规范程度相近
+    provinces = list(PROVINCE_CENTROIDS)
+    choices = provinces + [name + '省' for name in provinces[4:31]] + list(CITY_CENTROIDS)
+    return rng.choice(choices, n_companies)
+
+
+def _report_texts(rng, n_rows, text_length, keyword_share):
+    if text_length <= 0:
+        return None
+    phrases = np.array(FILLER_PHRASES + KEYWORD_PHRASES, dtype=object)
+    weights = np.r_[np.full(len(FILLER_PHRASES), (1 - keyword_share) / len(FILLER_PHRASES)),
+                    np.full(len(KEYWORD_PHRASES), keyword_share / len(KEYWORD_PHRASES))]
+    mean_phrase_length = np.dot(weights, [len(phrase) for phrase in phrases])
+    per_row = max(1, int(round(text_length / mean_phrase_length)))
+    picks = phrases[rng.choice(len(phrases), size=(n_rows, per_row), p=weights)]
+    return pd.Series([''.join(row) for row in picks], dtype=object)
+
+
+def make_annual_reports(scale=1, seed=0, text_length=300, keyword_share=0.3):
+    """生成 scale 倍规模的合成数据，按年份排序（与原始工作簿一致）。text_length 为 0 时不生成文本列。"""
+    rng = np.random.default_rng(seed)
+    n_companies = int(BASE_COMPANIES * scale)
+    codes = np.sort(rng.choice(np.arange(1, 1000000), n_companies, replace=False))
+    names = _company_names(rng, n_companies).to_numpy()
+    regions = _regions(rng, n_companies)
+    industries = rng.choice(INDUSTRIES, n_companies)
+
+    company = np.repeat(np.arange(n_companies), len(YEARS))
+    years = np.tile(YEARS, n_companies)
+    keep = rng.random(len(company)) < KEEP_RATIO
+    company, years = company[keep], years[keep]
+    n_rows = len(company)
+
+    # 词频随年份增长，企业间差异用 gamma 分布刻画
+    growth = (years - YEARS[0]) / (len(YEARS) - 1)
+    intensity = rng.gamma(0.6, 1.0, n_companies)[company] * (0.2 + 2.0 * growth)
+    counts = {}
+    for col, scale_factor in [('人工智能词频数', 6), ('大数据词频数', 4), ('云计算词频数', 3),
+                              ('区块链词频数', 1), ('数字技术运用词频数', 10)]:
+        counts[col] = rng.poisson(intensity * scale_factor)
+    tech = counts['人工智能词频数'] + counts['大数据词频数'] + counts['云计算词频数'] + counts['区块链词频数']
+    application = counts['数字技术运用词频数']
+    index = np.round(np.log1p(tech + application) * 12 + rng.normal(0, 2, n_rows).clip(0), 1)
+    index[rng.random(n_rows) < MISSING_INDEX_RATIO] = np.nan
+
+    df = pd.DataFrame({
+        '股票代码': codes[company],
+        '企业名称': names[company],
+        '年份': years,
+        '所属地区': regions[company],
+        '所属行业': industries[company],
+        **counts,
+        '技术维度': tech.astype(float),
+        '应用维度': application.astype(float),
+        '词总': (tech + application).astype(float),
+        '数字化转型指数': index,
+    })
+    texts = _report_texts(rng, n_rows, text_length, keyword_share)
+    if texts is not None:
+        df['年报内容'] = texts.to_numpy()
+    return df.sort_values('年份', kind='stable').reset_index(drop=True)
+
+
+def write_dataset(df, output):
+    """按输出路径写出：.xlsx 工作簿、.csv 文件，或目录（每个年份一个 CSV，供分区数据集读取）。"""
+    if output.lower().endswith('.xlsx'):
+        if len(df) >= EXCEL_MAX_ROWS:
+            raise ValueError(f'{len(df)} 行超过了 Excel 工作表的行数上限，请输出为 CSV 或目录')
+        df.to_excel(output, index=False)
+    elif output.lower().endswith('.csv'):
+        df.to_csv(output, index=False, encoding='utf-8-sig')
+    else:
+        os.makedirs(output, exist_ok=True)
+        for year, part in df.groupby('年份'):
+            part.to_csv(os.path.join(output, f'{year}.csv'), index=False, encoding='utf-8-sig')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='生成合成年报数据')
+    parser.add_argument('--scale', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--text-length', type=int, default=300, help='年报内容的平均字数，0 表示不生成')
+    parser.add_argument('--output', required=True, help='.xlsx、.csv 或目录')
+    args = parser.parse_args()
+    frame = make_annual_reports(args.scale, args.seed, args.text_length)
+    write_dataset(frame, args.output)
+    print(f'已生成 {len(frame)} 行，{frame["股票代码"].nunique()} 家企业: {args.output}')
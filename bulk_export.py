@@ -0,0 +1,228 @@
+"""按地区、行业、年份范围筛选后的批量导出（CSV/Parquet/XLSX，或按企业分文件打包为 zip）。
+
+导出只在用户点击下载时生成：按筛选条件的行位置分块写入目标文件，
+不会先把整个结果拼成一个字符串或字节串。生成的文件以 (数据集版本, 表, 筛选条件, 格式) 的指纹命名，
+保存在缓存目录的 exports 子目录中，相同条件再次导出时直接复用，超过数量上限时删除最久未使用的文件。
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from data_cache import HAS_PYARROW, cache_dir_for
+
+EXPORT_FORMAT_VERSION = 1
+EXPORT_DIR_NAME = 'exports'
+EXPORT_CHUNK_ROWS = 20000
+MAX_CACHED_EXPORTS = 32
+# Excel 单个工作表的最大数据行数（不含表头）
+XLSX_MAX_ROWS = 1048575
+
+# 格式名 -> (文件扩展名, MIME 类型)
+EXPORT_FORMATS = {
+    'CSV (zip)': ('csv.zip', 'application/zip'),
+    '按企业分文件的 CSV (zip)': ('companies.zip', 'application/zip'),
+    'XLSX': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+if HAS_PYARROW:
+    EXPORT_FORMATS['Parquet'] = ('parquet', 'application/vnd.apache.parquet')
+
+
+def export_fingerprint(dataset_version, table_name, filters, export_format, **params):
+    payload = json.dumps({
+        'format_version': EXPORT_FORMAT_VERSION,
+        'dataset_version': dataset_version,
+        'table': table_name,
+        'filters': filters,
+        'export_format': export_format,
+        'params': params,
+    }, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def export_dir_for(file_path):
+    return os.path.join(cache_dir_for(file_path), EXPORT_DIR_NAME)
+
+
+def filter_positions(frame, filters):
+    """满足筛选条件的行位置。filters 形如 {'年份': (起, 止), 列名: [取值, ...]}，空列表表示不筛选。"""
+    mask = np.ones(len(frame), dtype=bool)
+    for col, condition in filters.items():
+        if col not in frame.columns or not condition:
+            continue
+        if col == '年份':
+            start, stop = condition
+            years = frame['年份'].to_numpy()
+            mask &= (years >= start) & (years <= stop)
+        else:
+            mask &= frame[col].isin(condition).to_numpy()
+    return np.flatnonzero(mask)
+
+
+def column_values(frame, col):
+    """筛选框的可选值，category 列直接取其类别。"""
+    series = frame[col]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = series.cat.categories
+    else:
+        values = series.dropna().unique()
+    return sorted(values.tolist(), key=str)
+
+
+def iter_chunks(frame, positions, chunk_rows=EXPORT_CHUNK_ROWS):
+    for start in range(0, len(positions), chunk_rows):
+        yield frame.iloc[positions[start:start + chunk_rows]]
+
+
+def _write_csv_member(archive, member_name, frame, positions):
+    with archive.open(member_name, 'w', force_zip64=True) as raw:
+        # 带 BOM 的 UTF-8，Excel 直接打开时中文不会乱码
+        with io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as f:
+            frame.iloc[0:0].to_csv(f, index=False)
+            for chunk in iter_chunks(frame, positions):
+                chunk.to_csv(f, index=False, header=False)
+
+
+def write_csv_zip(frame, positions, path, member_name):
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        _write_csv_member(archive, member_name, frame, positions)
+
+
+def _csv_lines(frame, positions):
+    """把若干行格式化为 CSV 行的列表（不含表头）；字段中含换行符时无法按行拆分，返回 None。"""
+    lines = frame.iloc[positions].to_csv(index=False, header=False, lineterminator='\n').split('\n')[:-1]
+    return lines if len(lines) == len(positions) else None
+
+
+def write_company_zip(frame, positions, path):
+    """每家企业一个 CSV 文件。
+
+    逐家企业调用 to_csv 的固定开销很大（几千家企业要几十秒），这里按约 EXPORT_CHUNK_ROWS 行
+    把若干家完整的企业合成一批，一次格式化后再按行切分到各企业的文件中。
+    """
+    codes = frame['股票代码'].to_numpy()[positions]
+    order = np.argsort(codes, kind='stable')
+    codes, positions = codes[order], positions[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=np.int64)
+    stops = np.append(starts[1:], len(codes))
+    names = frame['企业名称'].to_numpy() if '企业名称' in frame.columns else None
+    header = frame.iloc[0:0].to_csv(index=False, lineterminator='\n')
+
+    def member_name(start):
+        label = str(codes[start])
+        if names is not None:
+            label += '_' + re.sub(r'[\\/:*?"<>|]', '_', str(names[positions[start]]))
+        return f'{label}.csv'
+
+    def write_batch(archive, companies):
+        batch_start, batch_stop = companies[0][0], companies[-1][1]
+        lines = _csv_lines(frame, positions[batch_start:batch_stop])
+        for start, stop in companies:
+            if lines is not None:
+                body = ''.join(line + '\n' for line in lines[start - batch_start:stop - batch_start])
+            else:
+                # 字段中含换行符时无法按行切分，退回逐家格式化
+                body = frame.iloc[positions[start:stop]].to_csv(index=False, header=False, lineterminator='\n')
+            # 带 BOM 的 UTF-8，Excel 直接打开时中文不会乱码
+            archive.writestr(member_name(start), (header + body).encode('utf-8-sig'))
+
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        companies = []
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            companies.append((start, stop))
+            if stop - companies[0][0] >= EXPORT_CHUNK_ROWS:
+                write_batch(archive, companies)
+                companies = []
+        if companies:
+            write_batch(archive, companies)
+
+
+def write_parquet(frame, positions, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in iter_chunks(frame, positions):
+            table = pa.Table.from_pandas(chunk, preserve_index=False,
+                                         schema=writer.schema if writer is not None else None)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+        if writer is None:
+            pq.write_table(pa.Table.from_pandas(frame.iloc[0:0], preserve_index=False), path)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_xlsx(frame, positions, path, sheet_name):
+    from openpyxl import Workbook
+
+    if len(positions) > XLSX_MAX_ROWS:
+        raise ValueError(f'{len(positions)} 行超过了 Excel 工作表的行数上限，请导出为 CSV 或 Parquet')
+    # 只写模式逐行写出，不在内存中保留单元格对象
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name[:31])
+    sheet.append([str(col) for col in frame.columns])
+    for chunk in iter_chunks(frame, positions):
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(path)
+
+
+def _prune_exports(directory, keep=MAX_CACHED_EXPORTS):
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if not name.endswith('.tmp')]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def get_export(file_path, dataset_version, table_name, build_frame, filters, export_format, **params):
+    """返回导出文件路径：已有相同指纹的文件时直接复用，否则调用 build_frame() 取得表并分块写出。"""
+    extension = EXPORT_FORMATS[export_format][0]
+    fingerprint = export_fingerprint(dataset_version, table_name, filters, export_format, **params)
+    directory = export_dir_for(file_path)
+    path = os.path.join(directory, f'{table_name}_{fingerprint}.{extension}')
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+
+    os.makedirs(directory, exist_ok=True)
+    frame = build_frame()
+    positions = filter_positions(frame, filters)
+    # 多个会话可能同时生成同一个导出文件，临时文件名按进程和线程区分
+    tmp_path = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    try:
+        if export_format == 'CSV (zip)':
+            write_csv_zip(frame, positions, tmp_path, f'{table_name}.csv')
+        elif export_format == '按企业分文件的 CSV (zip)':
+            write_company_zip(frame, positions, tmp_path)
+        elif export_format == 'Parquet':
+            write_parquet(frame, positions, tmp_path)
+        else:
+            write_xlsx(frame, positions, tmp_path, table_name)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _prune_exports(directory)
+    return path
+
+
+def export_file_name(table_name, filters, export_format):
+    parts = [table_name]
+    for col, condition in filters.items():
+        if condition:
+            parts.append(f'{condition[0]}-{condition[1]}' if col == '年份' else '、'.join(map(str, condition[:3])))
+    return '_'.join(parts) + '.' + EXPORT_FORMATS[export_format][0]
@@ -0,0 +1,68 @@
+"""matplotlib/seaborn 图表的渲染结果缓存。
+
+图表按 (图表类型, 股票代码, 指数列, 数据集版本) 等键缓存为 PNG/SVG 字节，容量有上限，按最近最少使用淘汰。
+每次渲染都显式创建、导出并关闭 Figure，长时间运行的服务不会累积未释放的图形。
+"""
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+
+
+def figure_to_bytes(fig, image_format='png', dpi=96):
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format=image_format, dpi=dpi)
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+class ChartCache:
+    def __init__(self, max_entries=256, image_format='png', dpi=96):
+        self.max_entries = max_entries
+        self.image_format = image_format
+        self.dpi = dpi
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # Streamlit 的多个会话在不同线程中运行，pyplot 的全局状态也不是线程安全的
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get_or_render(self, key, draw, *args, **kwargs):
+        """命中时直接返回缓存的图像字节；未命中时调用 draw(*args, **kwargs) 得到 Figure 并渲染。"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            self.misses += 1
+            fig = draw(*args, **kwargs)
+            image = figure_to_bytes(fig, self.image_format, self.dpi)
+            self._entries[key] = image
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return image
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'bytes': sum(len(image) for image in self._entries.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
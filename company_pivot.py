@@ -0,0 +1,72 @@
+"""企业 × 年份 的指数矩阵，用于多企业对比。
+
+每个指数列保存为一个 (企业数, 年份数) 的 float64 稠密数组（缺失为 NaN），另有股票代码、年份到行列号的映射。
+矩阵直接由 StockIndex 排序后的表按位置填充，每个数据集版本构建一次；
+对比 N 家企业只需按行号取出 N 行，不再对整张表做 N 次过滤。
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+
+
+class CompanyPivot:
+    def __init__(self, stock_index, columns):
+        frame = stock_index.frame
+        self.codes = list(stock_index.codes)
+        self.years = np.unique(stock_index.years).tolist()
+        self.code_rows = {code: i for i, code in enumerate(self.codes)}
+        self.year_columns = {year: j for j, year in enumerate(self.years)}
+
+        # 排序后的表中每一行所属的企业行号和年份列号
+        lengths = [stop - start for start, stop in (stock_index.offsets[code] for code in self.codes)]
+        rows = np.repeat(np.arange(len(self.codes)), lengths)
+        cols = np.searchsorted(self.years, stock_index.years)
+        starts = [stock_index.offsets[code][0] for code in self.codes]
+        self.names = dict(zip(self.codes, frame['企业名称'].to_numpy()[starts].tolist())) if len(frame) else {}
+
+        self.matrices = {}
+        for col in columns:
+            matrix = np.full((len(self.codes), len(self.years)), np.nan)
+            matrix[rows, cols] = frame[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            self.matrices[col] = matrix
+
+    def updated(self, stock_index, companies):
+        """数据更新后的矩阵：企业和年份都没有变化时只重填有变化的企业的行，否则重新构建。"""
+        if stock_index.codes != self.codes or np.unique(stock_index.years).tolist() != self.years:
+            return CompanyPivot(stock_index, list(self.matrices))
+        pivot = copy.copy(self)
+        pivot.names = dict(self.names)
+        pivot.matrices = {col: matrix.copy() for col, matrix in self.matrices.items()}
+        frame = stock_index.frame
+        for code in companies:
+            if code not in self.code_rows:
+                continue
+            start, stop = stock_index.offsets[code]
+            row = self.code_rows[code]
+            cols = np.searchsorted(self.years, stock_index.years[start:stop])
+            pivot.names[code] = frame['企业名称'].iloc[start]
+            for col, matrix in pivot.matrices.items():
+                matrix[row] = np.nan
+                matrix[row, cols] = frame[col].iloc[start:stop].to_numpy(dtype=np.float64, na_value=np.nan)
+        return pivot
+
+    @property
+    def nbytes(self):
+        return sum(matrix.nbytes for matrix in self.matrices.values())
+
+    def label(self, stock_code):
+        """用于选择框和图例的 “股票代码 企业名称”。"""
+        return f'{stock_code} {self.names.get(stock_code, "")}'.strip()
+
+    def values(self, column, stock_codes):
+        """所选企业的指数数组，形状为 (企业数, 年份数)；不存在的股票代码会被忽略。"""
+        rows = [self.code_rows[code] for code in stock_codes if code in self.code_rows]
+        return self.matrices[column][rows]
+
+    def frame(self, column, stock_codes):
+        """所选企业的指数表：行为年份，列为企业，全为空的年份不显示。"""
+        stock_codes = [code for code in stock_codes if code in self.code_rows]
+        table = pd.DataFrame(self.values(column, stock_codes).T, index=pd.Index(self.years, name='年份'),
+                             columns=[self.label(code) for code in stock_codes])
+        return table.dropna(how='all')
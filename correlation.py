@@ -0,0 +1,201 @@
+"""维度相关性热力图用的相关系数引擎。
+
+按“成对完整观测”计算 Pearson 相关系数（与 DataFrame.corr() 的缺失值处理一致），
+但只保存可加的累计量：每对列同时非空的行数，以及这些行上的 Σx、Σx²、Σxy。
+累计量通过矩阵乘法一次得到；追加新行时只需把新行的累计量加上去，不必重算已有的行。
+为避免数值抵消，每列先减去一个固定的平移量再累计，平移量不同的累计量合并前先换算到同一平移量。
+
+数据集按年份分块累计，并记录各年份数据的哈希；数据集更新（如新增一个年份的文件）后
+只重新累计哈希变化的年份，其余年份沿用上一版本快照中的累计量。
+"""
+import numpy as np
+import pandas as pd
+
+from data_compact import KEY_COLUMNS
+
+PARTITION_COLUMN = '年份'
+# 列数不超过该值时在热力图中标注数值
+ANNOTATE_MAX_COLUMNS = 12
+
+
+def analysis_columns(index_columns, numeric_columns):
+    """参与分布和相关性分析的数值列：指数列在前，股票代码、年份等标识列除外。"""
+    return list(index_columns) + [col for col in numeric_columns
+                                  if col not in index_columns and col not in KEY_COLUMNS]
+
+
+class CorrelationAccumulator:
+    def __init__(self, columns, shift=None):
+        self.columns = list(columns)
+        size = len(self.columns)
+        self.shift = np.zeros(size) if shift is None else np.asarray(shift, dtype=np.float64)
+        # 均为 (列数, 列数)：count[i, j] 为两列同时非空的行数，sum_x[i, j] 为这些行上第 i 列之和
+        self.count = np.zeros((size, size))
+        self.sum_x = np.zeros((size, size))
+        self.sum_xx = np.zeros((size, size))
+        self.sum_xy = np.zeros((size, size))
+
+    @classmethod
+    def from_frame(cls, frame, columns, shift=None):
+        accumulator = cls(columns, shift)
+        accumulator.update(frame)
+        return accumulator
+
+    def update(self, frame):
+        """累计新追加的行。"""
+        values = frame[self.columns].to_numpy(dtype=np.float64, na_value=np.nan) - self.shift
+        valid = np.isfinite(values)
+        mask = valid.astype(np.float64)
+        values = np.where(valid, values, 0.0)
+        self.count += mask.T @ mask
+        self.sum_x += values.T @ mask
+        self.sum_xx += (values * values).T @ mask
+        self.sum_xy += values.T @ values
+        return self
+
+    def shifted(self, shift):
+        """换算到另一个平移量下的累计量（x - b = (x - a) + d，d = a - b）。"""
+        shift = np.asarray(shift, dtype=np.float64)
+        d = self.shift - shift
+        result = CorrelationAccumulator(self.columns, shift)
+        result.count = self.count.copy()
+        result.sum_x = self.sum_x + self.count * d[:, None]
+        result.sum_xx = self.sum_xx + 2 * d[:, None] * self.sum_x + self.count * (d ** 2)[:, None]
+        result.sum_xy = (self.sum_xy + d[None, :] * self.sum_x + d[:, None] * self.sum_x.T
+                         + self.count * np.outer(d, d))
+        return result
+
+    def __add__(self, other):
+        if other.columns != self.columns:
+            raise ValueError('列不一致的累计量不能合并')
+        other = other if np.array_equal(other.shift, self.shift) else other.shifted(self.shift)
+        result = CorrelationAccumulator(self.columns, self.shift)
+        result.count = self.count + other.count
+        result.sum_x = self.sum_x + other.sum_x
+        result.sum_xx = self.sum_xx + other.sum_xx
+        result.sum_xy = self.sum_xy + other.sum_xy
+        return result
+
+    def matrix(self):
+        """相关系数矩阵；同时非空的行少于两行或某列方差为 0 时为 NaN。"""
+        n = self.count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = n * self.sum_xy - self.sum_x * self.sum_x.T
+            variance = n * self.sum_xx - self.sum_x ** 2
+            corr = covariance / np.sqrt(variance * variance.T)
+        corr[(n < 2) | ~(variance > 0) | ~(variance.T > 0)] = np.nan
+        corr = np.clip(corr, -1, 1)
+        diagonal = np.diag_indices_from(corr)
+        corr[diagonal] = np.where(np.isnan(corr[diagonal]), np.nan, 1.0)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+def partition_hashes(df, columns, by=PARTITION_COLUMN):
+    """各分块（年份）数据内容的哈希，与行的顺序无关。"""
+    row_hashes = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    hashes = {}
+    for key, positions in df.groupby(by).indices.items():
+        selected = row_hashes[positions]
+        hashes[key] = f'{len(selected)}:{int(np.bitwise_xor.reduce(selected))}:{int(selected.sum(dtype=np.uint64))}'
+    return hashes
+
+
+class CorrelationEngine:
+    def __init__(self, columns, partitions, hashes, recomputed=0):
+        self.columns = list(columns)
+        self.partitions = partitions
+        self.hashes = hashes
+        self.recomputed = recomputed
+        # 各分块使用同一平移量，合计也沿用该平移量
+        first = next(iter(partitions.values()), None)
+        self.total = CorrelationAccumulator(self.columns, first.shift if first is not None else None)
+        for accumulator in partitions.values():
+            self.total = self.total + accumulator
+        self.corr = self.total.matrix()
+        # 按列组合缓存的聚类叶子顺序（引擎随统计快照按数据集版本构建）
+        self.cluster_orders = {}
+
+    def append(self, frame, by=PARTITION_COLUMN):
+        """追加新行：按分块累加到已有累计量上（追加到已有年份时该年份的哈希不再可用）。"""
+        for key, part in frame.groupby(by):
+            accumulator = CorrelationAccumulator.from_frame(part, self.columns, self.total.shift)
+            self.partitions[key] = self.partitions[key] + accumulator if key in self.partitions else accumulator
+            self.hashes.pop(key, None)
+            self.total = self.total + accumulator
+        self.corr = self.total.matrix()
+        self.cluster_orders = {}
+        return self
+
+    def matrix(self, columns=None):
+        columns = self.columns if columns is None else [col for col in columns if col in self.columns]
+        return self.corr.loc[columns, columns]
+
+    def top_pairs(self, k=10, columns=None, absolute=True):
+        """相关性最强的 k 对列（默认按绝对值排序）。"""
+        corr = self.matrix(columns)
+        upper = np.triu(np.ones(corr.shape, dtype=bool), k=1)
+        rows, cols = np.nonzero(upper & corr.notna().to_numpy())
+        values = corr.to_numpy()[rows, cols]
+        order = np.argsort(-np.abs(values) if absolute else -values, kind='stable')[:k]
+        return pd.DataFrame({
+            '列1': corr.index[rows[order]],
+            '列2': corr.columns[cols[order]],
+            '相关系数': values[order],
+        })
+
+    def clustered_columns(self, columns=None):
+        """按平均链接层次聚类（距离为 1 - |r|）的叶子顺序排列列，相关的列排在一起。"""
+        corr = self.matrix(columns)
+        key = tuple(corr.index)
+        if key not in self.cluster_orders:
+            order = average_linkage_order(1 - np.abs(corr.fillna(0).to_numpy()))
+            self.cluster_orders[key] = [corr.index[i] for i in order]
+        return list(self.cluster_orders[key])
+
+
+def average_linkage_order(distance):
+    """平均链接层次聚类的叶子顺序。
+
+    簇间距离矩阵用 Lance-Williams 公式更新：合并 a、b 后新簇到 k 的距离为
+    (n_a·d(k,a) + n_b·d(k,b)) / (n_a + n_b)，每次合并只需一次矩阵运算。
+    """
+    linkage = np.asarray(distance, dtype=np.float64)
+    clusters = [[i] for i in range(len(linkage))]
+    sizes = np.ones(len(linkage))
+    while len(clusters) > 1:
+        count = len(clusters)
+        # 上三角中距离最小的一对，相同时取行优先的第一对
+        upper = np.where(np.triu(np.ones((count, count), dtype=bool), k=1), linkage, np.inf)
+        a, b = divmod(int(np.argmin(upper)), count)
+        left, right = clusters[a], clusters[b]
+        # 让两簇相邻端点的距离尽量小
+        candidates = [first + second for first in (left, left[::-1]) for second in (right, right[::-1])]
+        merged = min(candidates, key=lambda order: distance[order[len(left) - 1], order[len(left)]])
+
+        keep = [i for i in range(count) if i not in (a, b)]
+        row = (sizes[a] * linkage[a, keep] + sizes[b] * linkage[b, keep]) / (sizes[a] + sizes[b])
+        linkage = np.block([[linkage[np.ix_(keep, keep)], row[:, None]], [row[None, :], np.zeros((1, 1))]])
+        sizes = np.append(sizes[keep], sizes[a] + sizes[b])
+        clusters = [clusters[i] for i in keep] + [merged]
+    return clusters[0] if clusters else []
+
+
+def build_correlation_engine(df, columns, previous=None, by=PARTITION_COLUMN):
+    """按年份分块累计；传入上一版本的引擎时，哈希未变化的年份直接复用其累计量。"""
+    columns = list(columns)
+    hashes = partition_hashes(df, columns, by)
+    reusable = previous is not None and previous.columns == columns
+    shift = previous.total.shift if reusable else np.nan_to_num(
+        df[columns].mean().to_numpy(dtype=np.float64, na_value=np.nan))
+    partitions = {}
+    recomputed = 0
+    groups = None
+    for key, digest in hashes.items():
+        if reusable and previous.hashes.get(key) == digest and key in previous.partitions:
+            partitions[key] = previous.partitions[key]
+            continue
+        if groups is None:
+            groups = df.groupby(by).indices
+        partitions[key] = CorrelationAccumulator.from_frame(df.iloc[groups[key]], columns, shift)
+        recomputed += 1
+    return CorrelationEngine(columns, partitions, hashes, recomputed)
@@ -0,0 +1,169 @@
+"""年报工作簿的列式磁盘缓存。
+
+首次读取 Excel 后压缩数据类型并转存为 Parquet（未安装 pyarrow 时退回 .npz），
+之后按源文件的 mtime/大小/哈希 判断缓存是否有效，工作簿变化时自动重建。
+长文本列单独存为文本缓存，只在需要时读取。
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_compact import compact_frame
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# 缓存目录与工作簿放在同一目录下
+CACHE_DIR_NAME = '.cache'
+CACHE_FORMAT_VERSION = 2
+
+
+def file_sha256(file_path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(file_path, with_hash=True):
+    stat = os.stat(file_path)
+    fingerprint = {'mtime': stat.st_mtime_ns, 'size': stat.st_size}
+    if with_hash:
+        fingerprint['sha256'] = file_sha256(file_path)
+    return fingerprint
+
+
+def cache_dir_for(file_path):
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME)
+
+
+def cache_paths(file_path):
+    base = os.path.join(cache_dir_for(file_path), os.path.basename(file_path))
+    suffix = '.parquet' if HAS_PYARROW else '.npz'
+    return base + suffix, base + '.meta.json'
+
+
+def text_cache_path(file_path):
+    base = os.path.join(cache_dir_for(file_path), os.path.basename(file_path) + '.text')
+    return base + ('.parquet' if HAS_PYARROW else '.npz')
+
+
+def write_frame(df, path):
+    # 先写临时文件再替换，避免并发读取到写了一半的缓存
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    if path.endswith('.parquet'):
+        df.to_parquet(tmp_path, index=False)
+    else:
+        arrays = {f'c{i}': df[col].to_numpy() for i, col in enumerate(df.columns)}
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    return {'columns': [str(col) for col in df.columns],
+            'dtypes': [str(dtype) for dtype in df.dtypes]}
+
+
+def read_frame(path, schema=None, columns=None):
+    if path.endswith('.parquet'):
+        frame = pd.read_parquet(path, columns=columns)
+        if schema is not None:
+            # pyarrow 并不总能保留 category 类型，按元数据还原
+            for col, dtype in zip(schema['columns'], schema['dtypes']):
+                if dtype == 'category' and col in frame.columns and str(frame[col].dtype) != dtype:
+                    frame[col] = frame[col].astype('category')
+        return frame
+
+    # .npz 不保存列名和类型，需要由元数据还原
+    with np.load(path, allow_pickle=True) as data:
+        frame = {}
+        for i, (col, dtype) in enumerate(zip(schema['columns'], schema['dtypes'])):
+            if columns is not None and col not in columns:
+                continue
+            values = data[f'c{i}']
+            frame[col] = pd.Series(values, name=col).astype(dtype) if str(values.dtype) != dtype else values
+    return pd.DataFrame(frame)
+
+
+def read_meta(meta_path):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_meta(meta_path, meta):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def validate_cache(file_path):
+    """返回仍然有效的缓存元数据，缓存缺失或过期时返回 None。"""
+    data_path, meta_path = cache_paths(file_path)
+    meta = read_meta(meta_path)
+    if (meta is None or not os.path.exists(data_path)
+            or meta.get('format_version') != CACHE_FORMAT_VERSION):
+        return None
+
+    current = file_fingerprint(file_path, with_hash=False)
+    source = meta['source']
+    if current['mtime'] == source['mtime'] and current['size'] == source['size']:
+        return meta
+    if current['size'] != source['size']:
+        return None
+
+    # mtime 变了但大小没变（如复制、touch），用内容哈希确认是否真的修改
+    if file_sha256(file_path) != source['sha256']:
+        return None
+    meta['source']['mtime'] = current['mtime']
+    write_meta(meta_path, meta)
+    return meta
+
+
+def build_cache(file_path):
+    data_path, meta_path = cache_paths(file_path)
+    fingerprint = file_fingerprint(file_path)
+    df, text, memory = compact_frame(pd.read_excel(file_path))
+    meta = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'source': fingerprint,
+        'schema': write_frame(df, data_path),
+        'text_schema': write_frame(text, text_cache_path(file_path)) if text is not None else None,
+        'memory': memory,
+    }
+    write_meta(meta_path, meta)
+    return df, meta
+
+
+def read_cached_workbook(file_path):
+    """读取工作簿主表，优先使用列式缓存；返回 (DataFrame, 缓存元数据)。
+
+    元数据中 source 为源文件指纹，memory 为压缩前后的内存占用，text_schema 为长文本缓存的列信息。
+    """
+    meta = validate_cache(file_path)
+    if meta is not None:
+        data_path, _ = cache_paths(file_path)
+        try:
+            return read_frame(data_path, meta['schema']), meta
+        except Exception:
+            # 缓存损坏时回退到重新解析工作簿
+            pass
+    return build_cache(file_path)
+
+
+def read_text_store(file_path, meta, columns=None):
+    """读取长文本缓存（股票代码、年份 加各文本列），工作簿没有长文本列时返回 None。"""
+    if not meta.get('text_schema'):
+        return None
+    if columns is not None:
+        columns = [col for col in meta['text_schema']['columns'] if col in ('股票代码', '年份') or col in columns]
+    return read_frame(text_cache_path(file_path), meta['text_schema'], columns=columns)
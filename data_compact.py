@@ -0,0 +1,81 @@
+"""加载后的数据类型压缩。
+
+低基数的字符串列（企业名称、地区、行业等）和股票代码转为 category，年份转为 int16，
+整数指标按取值范围缩小位宽，小数位数有限的浮点指标转为 float32。
+长文本列从常驻内存的主表中拆出，单独存放、按需加载。
+"""
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ['股票代码', '年份']
+
+# 平均长度超过该值的字符串列视为长文本
+TEXT_MIN_MEAN_LENGTH = 64
+# 唯一值占比低于该值的字符串列转为 category
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+# 浮点列最多保留的小数位数，超过则保持 float64
+FLOAT32_MAX_DECIMALS = 4
+
+
+def memory_footprint(df):
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _is_string_column(series):
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def find_text_columns(df):
+    text_columns = []
+    for col in df.columns:
+        if col in KEY_COLUMNS or not _is_string_column(df[col]):
+            continue
+        lengths = df[col].dropna().astype(str).str.len()
+        if len(lengths) and lengths.mean() > TEXT_MIN_MEAN_LENGTH:
+            text_columns.append(col)
+    return text_columns
+
+
+def _float32_safe(values):
+    # 找到能表示全部取值的最少小数位数，float32 往返后在该精度下不变才降位
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return True
+    for decimals in range(FLOAT32_MAX_DECIMALS + 1):
+        if np.array_equal(np.round(finite, decimals), finite):
+            restored = np.round(finite.astype(np.float32).astype(np.float64), decimals)
+            return np.array_equal(restored, finite)
+    return False
+
+
+def compact_column(series):
+    if series.name == '股票代码' or (_is_string_column(series) and series.nunique(dropna=True) <= CATEGORY_MAX_UNIQUE_RATIO * len(series)):
+        return series.astype('category')
+    if series.name == '年份' and pd.api.types.is_integer_dtype(series):
+        return series.astype(np.int16)
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    if pd.api.types.is_float_dtype(series) and _float32_safe(series.to_numpy(dtype=np.float64)):
+        return series.astype(np.float32)
+    return series
+
+
+def compact_frame(df, text_columns=None):
+    """返回 (压缩后的主表, 长文本表, 内存报告)。长文本表保留 股票代码、年份 两列用于关联。"""
+    if text_columns is None:
+        text_columns = find_text_columns(df)
+    before = memory_footprint(df)
+
+    hot = df.drop(columns=text_columns)
+    hot = pd.DataFrame({col: compact_column(hot[col]) for col in hot.columns}, index=hot.index)
+
+    keys = [col for col in KEY_COLUMNS if col in hot.columns]
+    text = pd.concat([hot[keys], df[text_columns]], axis=1) if text_columns else None
+
+    report = {
+        'before': before,
+        'after': memory_footprint(hot),
+        'text': memory_footprint(text) if text is not None else 0,
+        'text_columns': list(text_columns),
+    }
+    return hot, text, report
@@ -0,0 +1,362 @@
+"""与所选股票、年份无关的全局统计快照。
+
+数据集加载后一次性计算统计概览、指数详细统计、相关系数矩阵和地区统计，
+按数据集版本号区分，并持久化到磁盘，冷启动时直接读取。
+数据集更新后，相关系数只重新累计数据有变化的年份（见 correlation.py），
+热更新时地区统计只重新汇总有数据变化的地区（见 hot_reload.py）。
+数据目录模式下快照不从常驻主表计算，而是逐个年份分区只读取需要的列（见 compute_store_statistics），
+同一时间只有一个分区在内存中：计数、均值、标准差和极值按分区合并，中位数和分位数先用细分直方图
+定位所在的区间再取该区间内的取值，结果是精确值。
+"""
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from data_cache import cache_dir_for
+from correlation import (CorrelationAccumulator, CorrelationEngine, analysis_columns, build_correlation_engine,
+                         partition_hashes)
+from distribution import DistributionAccumulator, compute_distributions
+from region_geo import attach_coordinates
+
+SNAPSHOT_FORMAT_VERSION = 5
+# 分区统计时定位分位数所用直方图的区间数
+QUANTILE_BINS = 4096
+
+# 详细统计的展示顺序与名称
+INDEX_STAT_NAMES = ['平均值', '中位数', '标准差', '最小值', '最大值', '25%分位数', '75%分位数']
+
+
+def compute_index_stats(df, index_columns):
+    # 一次聚合得到所有指数列的统计量，行为统计量、列为指数列
+    values = df[index_columns]
+    stats = values.agg(['mean', 'median', 'std', 'min', 'max'])
+    quantiles = values.quantile([0.25, 0.75])
+    stats = pd.concat([stats, quantiles])
+    stats.index = INDEX_STAT_NAMES
+    return stats
+
+
+def compute_region_stats(df, region_col, index_col):
+    region_stats = df.groupby(region_col, observed=True).agg({
+        '股票代码': 'nunique',
+        index_col: ['mean', 'min', 'max', 'count']
+    }).reset_index()
+    region_stats.columns = [region_col, '企业数量', '平均指数', '最低指数', '最高指数', '数据条数']
+    # 关联离线坐标表，供地图使用
+    return attach_coordinates(region_stats, region_col)
+
+
+def update_region_stats(previous, df, region_col, index_col, regions):
+    """只重新汇总有数据变化的地区，其余地区沿用上一版本的结果。"""
+    regions = {str(region) for region in regions}
+    kept = previous[~previous[region_col].astype(str).isin(regions)]
+    changed = df[df[region_col].astype(str).isin(regions)]
+    region_stats = pd.concat([kept, compute_region_stats(changed, region_col, index_col)], ignore_index=True)
+    region_stats[region_col] = region_stats[region_col].astype(str)
+    return region_stats.sort_values(region_col, kind='stable').reset_index(drop=True)
+
+
+def compute_statistics(df, index_columns, region_col=None, previous=None, changed_regions=None):
+    """previous 为上一版本的快照：相关系数按年份复用其累计量；
+    同时给出 changed_regions（有数据变化的地区）时，地区统计只重新汇总这些地区。
+    """
+    index_col = index_columns[0]
+    years = sorted(df['年份'].dropna().unique().tolist())
+    numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
+    # 指数列在前，其余数值列（词频数、维度等）在后，股票代码、年份等标识列除外
+    value_columns = analysis_columns(index_columns, numeric_columns)
+    previous_correlation = previous.get('correlation') if previous is not None else None
+    correlation = build_correlation_engine(df, value_columns, previous_correlation) if len(value_columns) > 1 else None
+    if not region_col:
+        region_stats = None
+    elif (changed_regions is not None and previous.get('region_col') == region_col
+            and previous['index_columns'][0] == index_col and previous.get('region_stats') is not None):
+        region_stats = update_region_stats(previous['region_stats'], df, region_col, index_col, changed_regions)
+    else:
+        region_stats = compute_region_stats(df, region_col, index_col)
+
+    snapshot = {
+        'record_count': len(df),
+        'company_count': df['股票代码'].nunique(),
+        'years': years,
+        'index_columns': list(index_columns),
+        'index_stats': compute_index_stats(df, list(index_columns)),
+        'numeric_columns': numeric_columns,
+        'correlation': correlation,
+        'corr_matrix': correlation.corr if correlation is not None else None,
+        'region_col': region_col,
+        'region_stats': region_stats,
+        'distributions': compute_distributions(df, value_columns),
+    }
+    return snapshot
+
+
+def _numeric_columns(store, columns):
+    # 与常驻主表的 select_dtypes(np.number) 一致：股票代码在主表中为 category，不算数值列
+    numeric = []
+    for col in columns:
+        dtypes = [partition['schema']['dtypes'][partition['schema']['columns'].index(col)]
+                  for partition in store.manifest['partitions'].values() if col in partition['schema']['columns']]
+        try:
+            if col != '股票代码' and dtypes and all(pd.api.types.pandas_dtype(dtype).kind in 'iuf' for dtype in dtypes):
+                numeric.append(col)
+        except TypeError:
+            pass
+    return numeric
+
+
+class _Moments:
+    """各列的个数、均值、离差平方和与极值，按块合并（Chan 等人的并行算法），不保留原始值。"""
+
+    def __init__(self, size):
+        self.count = np.zeros(size)
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+        self.minimum = np.full(size, np.inf)
+        self.maximum = np.full(size, -np.inf)
+
+    def update(self, values):
+        valid = np.isfinite(values)
+        count = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(valid, values, 0.0).sum(axis=0) / count
+            m2 = np.where(valid, (values - mean) ** 2, 0.0).sum(axis=0)
+        has = count > 0
+        total = self.count + count
+        delta = np.where(has, mean, 0.0) - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = np.where(has, self.mean + delta * count / total, self.mean)
+            self.m2 = np.where(has, self.m2 + np.where(has, m2, 0.0) + delta ** 2 * self.count * count / total, self.m2)
+        self.count = total
+        self.minimum = np.fmin(self.minimum, np.where(valid, values, np.inf).min(axis=0, initial=np.inf))
+        self.maximum = np.fmax(self.maximum, np.where(valid, values, -np.inf).max(axis=0, initial=-np.inf))
+
+    def std(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+
+def _quantile_bins(values, minimum, maximum):
+    if not maximum > minimum:
+        return np.zeros(len(values), dtype=np.int64)
+    return np.clip(((values - minimum) / (maximum - minimum) * QUANTILE_BINS).astype(np.int64), 0, QUANTILE_BINS - 1)
+
+
+def compute_store_statistics(store, index_columns, region_col=None, previous=None):
+    """按年份分区计算与 compute_statistics 相同结构的快照，只读取需要的列，同一时间只有一个分区在内存中。
+
+    第一遍累计计数、均值、标准差、极值、企业和地区汇总；第二遍按全局极值和标准差累计相关系数、
+    直方图、核密度和分位数直方图；第三遍只读取指数列，取出分位数所在区间的取值。
+    previous 为上一版本的快照时，数据未变化的年份复用其相关系数累计量。
+    """
+    index_columns = list(index_columns)
+    index_col = index_columns[0]
+    hot_columns = [col for col in store.columns if col not in store.text_columns]
+    numeric_columns = _numeric_columns(store, hot_columns)
+    value_columns = analysis_columns(index_columns, numeric_columns)
+
+    def partitions(columns):
+        for year, frame in store.iter_partitions(columns):
+            if len(frame):
+                yield year, frame.reindex(columns=columns)
+
+    def values(frame, columns):
+        return frame[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    # 第一遍
+    moments = _Moments(len(value_columns))
+    record_count = 0
+    years = []
+    companies = set()
+    hashes = {}
+    region_parts = []
+    region_pairs = None
+    first_columns = list(dict.fromkeys(['股票代码', '年份'] + value_columns + ([region_col] if region_col else [])))
+    for year, frame in partitions(first_columns):
+        record_count += len(frame)
+        years.append(year)
+        companies.update(frame['股票代码'].dropna().unique().tolist())
+        moments.update(values(frame, value_columns))
+        hashes.update(partition_hashes(frame, value_columns))
+        if region_col:
+            grouped = frame.groupby(region_col)[index_col]
+            region_parts.append(grouped.agg(['sum', 'count', 'min', 'max']))
+            pairs = frame[[region_col, '股票代码']].dropna().drop_duplicates()
+            region_pairs = pairs if region_pairs is None else pd.concat([region_pairs, pairs]).drop_duplicates()
+
+    # 第二遍
+    counts, std = moments.count, moments.std()
+    previous_correlation = previous.get('correlation') if previous is not None else None
+    reusable = previous_correlation is not None and previous_correlation.columns == value_columns
+    if reusable:
+        shift = previous_correlation.total.shift
+    else:
+        with np.errstate(invalid='ignore'):
+            shift = np.nan_to_num(np.where(counts > 0, moments.mean, np.nan))
+    correlation_parts = {}
+    for year, digest in hashes.items():
+        if reusable and previous_correlation.hashes.get(year) == digest and year in previous_correlation.partitions:
+            correlation_parts[year] = previous_correlation.partitions[year]
+    distributions = {col: DistributionAccumulator(int(counts[i]), moments.minimum[i], moments.maximum[i], std[i])
+                     for i, col in enumerate(value_columns)}
+    index_positions = [value_columns.index(col) for col in index_columns]
+    histograms = {col: np.zeros(QUANTILE_BINS, dtype=np.int64) for col in index_columns}
+    recomputed = 0
+    for year, frame in partitions(value_columns):
+        matrix = values(frame, value_columns)
+        if len(value_columns) > 1 and year not in correlation_parts:
+            correlation_parts[year] = CorrelationAccumulator(value_columns, shift).update(frame)
+            recomputed += 1
+        for i, col in enumerate(value_columns):
+            distributions[col].update(matrix[:, i])
+        for col, i in zip(index_columns, index_positions):
+            column = matrix[:, i][np.isfinite(matrix[:, i])]
+            histograms[col] += np.bincount(_quantile_bins(column, moments.minimum[i], moments.maximum[i]),
+                                           minlength=QUANTILE_BINS)
+
+    # 第三遍：分位数所在区间内的取值及其个数
+    quantiles = {0.25: '25%分位数', 0.5: '中位数', 0.75: '75%分位数'}
+    wanted = {}
+    for col, i in zip(index_columns, index_positions):
+        n = int(counts[i])
+        if not n:
+            continue
+        cumulative = np.cumsum(histograms[col])
+        for q in quantiles:
+            h = (n - 1) * q
+            for rank in (int(np.floor(h)), min(int(np.floor(h)) + 1, n - 1)):
+                b = int(np.searchsorted(cumulative, rank, side='right'))
+                wanted.setdefault(col, {})[rank] = (b, rank - (cumulative[b - 1] if b else 0))
+    bin_values = {col: {} for col in wanted}
+    if wanted:
+        for _, frame in partitions(list(wanted)):
+            for col in wanted:
+                i = value_columns.index(col)
+                column = values(frame, [col])[:, 0]
+                column = column[np.isfinite(column)]
+                bins = _quantile_bins(column, moments.minimum[i], moments.maximum[i])
+                for b in {b for b, _ in wanted[col].values()}:
+                    found, found_counts = np.unique(column[bins == b], return_counts=True)
+                    merged = bin_values[col].setdefault(b, {})
+                    for value, count in zip(found.tolist(), found_counts.tolist()):
+                        merged[value] = merged.get(value, 0) + count
+
+    def order_statistic(col, rank):
+        b, within = wanted[col][rank]
+        ordered = sorted(bin_values[col][b].items())
+        cumulative = np.cumsum([count for _, count in ordered])
+        return ordered[int(np.searchsorted(cumulative, within, side='right'))][0]
+
+    stats = {}
+    for col, i in zip(index_columns, index_positions):
+        n = int(counts[i])
+        column = {'平均值': moments.mean[i] if n else np.nan, '标准差': std[i],
+                  '最小值': moments.minimum[i] if n else np.nan, '最大值': moments.maximum[i] if n else np.nan}
+        for q, name in quantiles.items():
+            if not n:
+                column[name] = np.nan
+                continue
+            h = (n - 1) * q
+            low = int(np.floor(h))
+            low_value, high_value = order_statistic(col, low), order_statistic(col, min(low + 1, n - 1))
+            column[name] = low_value + (h - low) * (high_value - low_value)
+        stats[col] = column
+    index_stats = pd.DataFrame(stats, index=INDEX_STAT_NAMES, columns=index_columns)
+
+    correlation = None
+    if len(value_columns) > 1:
+        correlation = CorrelationEngine(value_columns, {year: correlation_parts[year] for year in hashes},
+                                        hashes, recomputed)
+
+    region_stats = None
+    if region_col:
+        if region_parts:
+            parts = pd.concat(region_parts)
+            grouped = parts.groupby(level=0)
+            aggregated = pd.DataFrame({'sum': grouped['sum'].sum(), 'count': grouped['count'].sum(),
+                                       'min': grouped['min'].min(), 'max': grouped['max'].max()})
+            companies_per_region = region_pairs.groupby(region_col).size()
+        else:
+            aggregated = pd.DataFrame(columns=['sum', 'count', 'min', 'max'])
+            companies_per_region = pd.Series(dtype=np.int64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = aggregated['sum'] / aggregated['count'].where(aggregated['count'] > 0)
+        region_stats = pd.DataFrame({
+            region_col: aggregated.index.astype(str),
+            '企业数量': companies_per_region.reindex(aggregated.index, fill_value=0).to_numpy(),
+            '平均指数': mean.to_numpy(dtype=np.float64),
+            '最低指数': aggregated['min'].to_numpy(dtype=np.float64),
+            '最高指数': aggregated['max'].to_numpy(dtype=np.float64),
+            '数据条数': aggregated['count'].to_numpy(dtype=np.int64),
+        }).sort_values(region_col, kind='stable').reset_index(drop=True)
+        region_stats = attach_coordinates(region_stats, region_col)
+
+    return {
+        'record_count': record_count,
+        'company_count': len(companies),
+        'years': sorted(years),
+        'index_columns': index_columns,
+        'index_stats': index_stats,
+        'numeric_columns': numeric_columns,
+        'correlation': correlation,
+        'corr_matrix': correlation.corr if correlation is not None else None,
+        'region_col': region_col,
+        'region_stats': region_stats,
+        'distributions': {col: accumulator.result() for col, accumulator in distributions.items()},
+    }
+
+
+def index_summary(snapshot, index_col):
+    """返回某个指数列的七项统计，键为 INDEX_STAT_NAMES。"""
+    return snapshot['index_stats'][index_col].to_dict()
+
+
+def snapshot_path(file_path):
+    return os.path.join(cache_dir_for(file_path), os.path.basename(file_path) + '.stats.pkl')
+
+
+def load_or_compute_statistics(df, dataset_version, file_path, index_columns, region_col=None, store=None):
+    """优先读取磁盘上同版本、同参数的快照，否则重新计算并写回；store 为数据目录的分区存储时按分区计算。"""
+    path = snapshot_path(file_path)
+    key = (SNAPSHOT_FORMAT_VERSION, dataset_version, tuple(index_columns), region_col)
+    previous = None
+    try:
+        with open(path, 'rb') as f:
+            stored = pickle.load(f)
+        if stored.get('key') == key:
+            return stored['snapshot']
+        # 数据集已更新：同一格式的旧快照中的相关系数累计量可以按年份复用
+        if stored['key'][0] == SNAPSHOT_FORMAT_VERSION:
+            previous = stored['snapshot']
+    except (OSError, pickle.PickleError, EOFError, AttributeError, KeyError, IndexError, TypeError):
+        pass
+
+    if store is not None:
+        snapshot = compute_store_statistics(store, index_columns, region_col, previous)
+    else:
+        snapshot = compute_statistics(df, index_columns, region_col, previous)
+    return save_statistics(snapshot, dataset_version, file_path, index_columns, region_col)
+
+
+def update_statistics(previous, df, dataset_version, file_path, index_columns, region_col=None, changed_regions=None,
+                      store=None):
+    """数据更新后基于上一版本的快照增量计算，并写回磁盘。"""
+    if store is not None:
+        snapshot = compute_store_statistics(store, index_columns, region_col, previous)
+    else:
+        snapshot = compute_statistics(df, index_columns, region_col, previous, changed_regions)
+    return save_statistics(snapshot, dataset_version, file_path, index_columns, region_col)
+
+
+def save_statistics(snapshot, dataset_version, file_path, index_columns, region_col=None):
+    snapshot['version'] = dataset_version
+    path = snapshot_path(file_path)
+    key = (SNAPSHOT_FORMAT_VERSION, dataset_version, tuple(index_columns), region_col)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'key': key, 'snapshot': snapshot}, f)
+    os.replace(tmp_path, path)
+    return snapshot
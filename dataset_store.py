@@ -0,0 +1,291 @@
+"""按年份分区的列式数据集，用于多批次、多工作簿的年报数据。
+
+数据目录下可以放多个工作簿（读取全部工作表）或 CSV，按块流式读取后按年份写入分区，
+(股票代码, 年份) 重复时保留排在后面的文件（及行）中的记录。
+构建时同一时间只有一个年份在内存中。企业历年数据（DatasetStore.history）只读取该企业所在的年份分区，
+全局统计快照（data_stats.compute_store_statistics）逐个分区只读取需要的列，长文本列按需读取，
+这些查询的内存占用取决于单个年份的数据量。排名、企业对比矩阵、搜索索引等仍在常驻主表（全部分区的非文本列）上计算，
+常驻主表的内存占用随语料总量增长。
+"""
+import hashlib
+import os
+import shutil
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from data_cache import HAS_PYARROW, cache_dir_for, file_fingerprint, file_sha256, read_frame, read_meta, write_frame, write_meta
+from data_compact import KEY_COLUMNS, compact_column, find_text_columns, memory_footprint
+
+SOURCE_SUFFIXES = ('.xlsx', '.xlsm', '.csv')
+CHUNK_ROWS = 50000
+STORE_FORMAT_VERSION = 3
+# 记录读入顺序，用于去重时保留最后出现的记录
+SEQ_COLUMN = '_序号'
+
+
+def list_sources(dir_path):
+    """按文件名顺序列出数据目录下的工作簿和 CSV（跳过 Office 临时文件）。"""
+    names = sorted(name for name in os.listdir(dir_path)
+                   if name.lower().endswith(SOURCE_SUFFIXES) and not name.startswith('~$'))
+    return [os.path.join(dir_path, name) for name in names]
+
+
+def store_dir_for(dir_path):
+    return os.path.join(cache_dir_for(dir_path), os.path.basename(os.path.normpath(dir_path)) + '.store')
+
+
+def _suffix():
+    return '.parquet' if HAS_PYARROW else '.npz'
+
+
+def iter_excel_chunks(file_path, chunk_rows=CHUNK_ROWS):
+    # openpyxl 只读模式逐行读取，不会一次性载入整个工作簿
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            columns = [str(name).strip() if name is not None else f'未命名{i}' for i, name in enumerate(header)]
+            batch = []
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                batch.append(row[:len(columns)])
+                if len(batch) >= chunk_rows:
+                    yield pd.DataFrame(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def iter_csv_chunks(file_path, chunk_rows=CHUNK_ROWS):
+    yield from pd.read_csv(file_path, chunksize=chunk_rows, encoding='utf-8-sig')
+
+
+def iter_source_chunks(file_path, chunk_rows=CHUNK_ROWS):
+    if file_path.lower().endswith('.csv'):
+        return iter_csv_chunks(file_path, chunk_rows)
+    return iter_excel_chunks(file_path, chunk_rows)
+
+
+def _code_text(code):
+    # 从工作簿读出的 600000.0 写为 600000
+    return str(int(code)) if isinstance(code, float) and code.is_integer() else str(code)
+
+
+def normalize_codes(codes):
+    """股票代码全部是整数时转为 int64，否则（如 600000.SH）统一为字符串。"""
+    numbers = pd.to_numeric(codes, errors='coerce')
+    if numbers.notna().all() and np.all(np.mod(numbers.to_numpy(dtype=np.float64), 1) == 0):
+        return numbers.astype(np.int64)
+    return codes.map(_code_text).astype(object)
+
+
+def normalize_chunk(chunk):
+    """统一键列类型并去掉缺少键的行；能完整转为数值的文本列转为数值。"""
+    missing = [col for col in KEY_COLUMNS if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"缺少必要的列: {', '.join(missing)}")
+
+    chunk = chunk.copy()
+    for col in chunk.columns:
+        if pd.api.types.is_numeric_dtype(chunk[col]):
+            continue
+        converted = pd.to_numeric(chunk[col], errors='coerce')
+        if converted.notna().sum() == chunk[col].notna().sum():
+            chunk[col] = converted
+    # 年份无法识别的行和缺少股票代码的行丢弃
+    chunk['年份'] = pd.to_numeric(chunk['年份'], errors='coerce')
+    years = chunk['年份'].to_numpy(dtype=np.float64, na_value=np.nan)
+    chunk = chunk[np.isfinite(years) & chunk['股票代码'].notna().to_numpy()].copy()
+    chunk['年份'] = chunk['年份'].astype(np.int64)
+    chunk['股票代码'] = normalize_codes(chunk['股票代码'])
+    return chunk
+
+
+def _combined_sha256(sources):
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update(source['name'].encode('utf-8'))
+        digest.update(source['sha256'].encode('ascii'))
+    return digest.hexdigest()
+
+
+def build_store(dir_path, chunk_rows=CHUNK_ROWS):
+    """流式读取数据目录并重建分区存储，返回清单（manifest）。"""
+    store_dir = store_dir_for(dir_path)
+    build_dir = store_dir + '.tmp'
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+    suffix = _suffix()
+
+    # 第一遍：按块读取，每块按年份拆开写入暂存文件
+    sources = []
+    columns = []
+    staged = defaultdict(list)
+    seq = 0
+    text_codes = False
+    for path in list_sources(dir_path):
+        sources.append(dict(file_fingerprint(path), name=os.path.basename(path)))
+        for chunk in iter_source_chunks(path, chunk_rows):
+            chunk = normalize_chunk(chunk)
+            text_codes = text_codes or chunk['股票代码'].dtype == object
+            columns.extend(col for col in chunk.columns if col not in columns)
+            chunk[SEQ_COLUMN] = np.arange(seq, seq + len(chunk))
+            seq += len(chunk)
+            for year, part in chunk.groupby('年份', sort=False):
+                part_path = os.path.join(build_dir, f'staging-{year}-{len(staged[year]):05d}{suffix}')
+                staged[year].append((part_path, write_frame(part, part_path)))
+
+    # 第二遍：逐个年份合并暂存文件并去重，同一时间只有一个年份在内存中
+    partitions = {}
+    text_columns = []
+    before = text_bytes = 0
+    for year in sorted(staged):
+        parts = staged.pop(year)
+        frame = pd.concat([read_frame(path, schema) for path, schema in parts], ignore_index=True)
+        if text_codes:
+            # 有任何一块含非数字的股票代码时，全部分区的股票代码都用字符串，类型一致
+            frame['股票代码'] = frame['股票代码'].map(_code_text).astype(object)
+        frame = (frame.sort_values(SEQ_COLUMN, kind='stable')
+                 .drop_duplicates(KEY_COLUMNS, keep='last')
+                 .drop(columns=SEQ_COLUMN)
+                 .sort_values('股票代码', kind='stable')
+                 .reset_index(drop=True))
+        file_name = f'年份={year}{suffix}'
+        partitions[str(year)] = {'file': file_name, 'rows': len(frame),
+                                 'schema': write_frame(frame, os.path.join(build_dir, file_name))}
+
+        year_text_columns = find_text_columns(frame)
+        text_columns.extend(col for col in year_text_columns if col not in text_columns)
+        before += memory_footprint(frame)
+        text_bytes += memory_footprint(frame[year_text_columns]) if year_text_columns else 0
+        for path, _ in parts:
+            os.remove(path)
+
+    manifest = {
+        'format_version': STORE_FORMAT_VERSION,
+        'sources': sources,
+        'sha256': _combined_sha256(sources),
+        'columns': columns,
+        'text_columns': text_columns,
+        'rows': sum(partition['rows'] for partition in partitions.values()),
+        'partitions': partitions,
+        'memory': {'before': before, 'text': text_bytes},
+    }
+    write_meta(os.path.join(build_dir, 'manifest.json'), manifest)
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(build_dir, store_dir)
+    return manifest
+
+
+def validate_store(dir_path):
+    """返回仍然有效的清单；来源文件有增删改或存储格式变化时返回 None。"""
+    manifest = read_meta(os.path.join(store_dir_for(dir_path), 'manifest.json'))
+    if manifest is None or manifest.get('format_version') != STORE_FORMAT_VERSION:
+        return None
+
+    paths = list_sources(dir_path)
+    if [os.path.basename(path) for path in paths] != [source['name'] for source in manifest['sources']]:
+        return None
+    for path, source in zip(paths, manifest['sources']):
+        current = file_fingerprint(path, with_hash=False)
+        if current['mtime'] == source['mtime'] and current['size'] == source['size']:
+            continue
+        # 与列式缓存相同：mtime 变了但大小没变时用内容哈希确认
+        if current['size'] != source['size'] or file_sha256(path) != source['sha256']:
+            return None
+    return manifest
+
+
+class DatasetStore:
+    def __init__(self, dir_path, manifest):
+        self.dir_path = dir_path
+        self.store_dir = store_dir_for(dir_path)
+        self.manifest = manifest
+        self.years = sorted(int(year) for year in manifest['partitions'])
+
+    @classmethod
+    def open(cls, dir_path, chunk_rows=CHUNK_ROWS):
+        manifest = validate_store(dir_path)
+        if manifest is None:
+            manifest = build_store(dir_path, chunk_rows)
+        return cls(dir_path, manifest)
+
+    @property
+    def columns(self):
+        return self.manifest['columns']
+
+    @property
+    def text_columns(self):
+        return self.manifest['text_columns']
+
+    def read_partition(self, year, columns=None):
+        partition = self.manifest['partitions'][str(year)]
+        schema = partition['schema']
+        if columns is not None:
+            # 某些批次可能缺少部分列，只读取该分区中存在的列
+            columns = [col for col in columns if col in schema['columns']]
+        return read_frame(os.path.join(self.store_dir, partition['file']), schema, columns=columns)
+
+    def iter_partitions(self, columns=None, years=None):
+        for year in self.years:
+            if years is None or year in years:
+                yield year, self.read_partition(year, columns)
+
+    def read(self, columns=None, years=None):
+        """读取指定列和年份，合并后压缩数据类型（键列为 category 等）。"""
+        frames = [frame for _, frame in self.iter_partitions(columns, years)]
+        if not frames:
+            return pd.DataFrame(columns=columns or self.columns)
+        frame = pd.concat(frames, ignore_index=True)
+        if columns is not None:
+            frame = frame.reindex(columns=columns)
+        return pd.DataFrame({col: compact_column(frame[col]) for col in frame.columns})
+
+    def history(self, stock_code, columns=None, years=None):
+        """某家企业的历年记录（按年份排序），只读取 years 中的年份分区（为 None 时逐个读取全部分区）和需要的列。"""
+        read_columns = None if columns is None else list(dict.fromkeys(['股票代码'] + list(columns)))
+        frames = [frame[(frame['股票代码'] == stock_code).to_numpy()]
+                  for _, frame in self.iter_partitions(read_columns, years)]
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return pd.DataFrame(columns=columns or self.columns)
+        frame = pd.concat(frames, ignore_index=True)
+        return frame.reindex(columns=columns) if columns is not None else frame
+
+
+def read_cached_dataset(dir_path):
+    """读取数据目录的常驻主表（不含长文本列），返回 (DataFrame, 元数据)。
+
+    元数据的结构与 read_cached_workbook 一致：source.sha256 为全部来源文件的组合哈希，
+    memory 为内存占用报告，store 为分区存储的清单。
+    """
+    store = DatasetStore.open(dir_path)
+    hot_columns = [col for col in store.columns if col not in store.text_columns]
+    df = store.read(hot_columns)
+    manifest = store.manifest
+    meta = {
+        'source': {'sha256': manifest['sha256']},
+        'memory': dict(manifest['memory'], after=memory_footprint(df), text_columns=list(store.text_columns)),
+        'store': manifest,
+    }
+    return df, meta
+
+
+def read_dataset_text(dir_path, meta, columns=None):
+    """读取长文本列（股票代码、年份 加各文本列），只读取这些列。"""
+    store = DatasetStore(dir_path, meta['store'])
+    columns = store.text_columns if columns is None else columns
+    if not columns:
+        return None
+    return store.read(KEY_COLUMNS + list(columns))
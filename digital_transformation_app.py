@@ -2,12 +2,25 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
+import time
+import uuid
 import matplotlib.font_manager as fm
-import re
 import folium
-from streamlit_folium import st_folium
 import numpy as np
 import seaborn as sns
+import plotly.graph_objects as go
+from analysis import default_source, load_dataset
+from shared_dataset import load_shared_dataset, shared_mode_enabled
+from data_stats import index_summary
+from keyword_engine import VOCABULARY_CLASSIFICATION, get_matcher
+from peer_ranking import ranking_summary
+from correlation import ANNOTATE_MAX_COLUMNS
+from trends import CAGR_COLUMN, MIN_TREND_YEARS
+from search_index import SEARCH_LIMIT
+from bulk_export import EXPORT_FORMATS, column_values, export_file_name, get_export
+from chart_cache import ChartCache
+from profiling import SectionProfiler, set_memory_tracing, to_jsonl
+from hot_reload import DatasetWatcher
 
 # 设置中文字体
 # 尝试多种常见中文字体以确保兼容性
@@ -28,80 +41,263 @@ st.set_page_config(
     initial_sidebar_state='expanded'
 )
 
-# 加载Excel数据
+# 监视数据源并持有当前数据集版本，同一进程内所有会话共享同一个DataFrame
+# 数据源变化后在后台重新加载、增量更新派生数据，就绪后才切换版本，切换前各会话继续使用旧版本
+@st.cache_resource(show_spinner='正在加载数据...')
+def get_dataset_watcher(file_path):
+    # 共享模式下挂载各服务进程共用的内存映射数据集（只读），否则读取缓存到本进程
+    return DatasetWatcher(file_path, load_shared_dataset if shared_mode_enabled() else load_dataset)
+
+# 以下派生数据都挂在数据集版本上，在所有会话间共享，数据更新时由监视线程增量更新
+# 全局统计快照与所选股票、年份无关（按数据集版本持久化）
+def get_statistics(dataset, index_columns, region_col):
+    with st.spinner('正在计算统计数据...'):
+        return dataset.derived('statistics', index_columns, region_col)
+
+# 按股票代码的查询索引
+def get_stock_index(dataset):
+    return dataset.derived('stock_index')
+
+# 侧边栏企业搜索用的索引（股票代码、企业名称、拼音首字母）
+def get_search_index(dataset):
+    with st.spinner('正在构建企业搜索索引...'):
+        return dataset.derived('search_index')
+
+# 同年、同行业、同地区的排名和百分位，与查询索引的排序表逐行对齐
+def get_rankings(dataset, index_col, industry_col, region_col):
+    with st.spinner('正在计算企业排名...'):
+        return dataset.derived('rankings', index_col, industry_col, region_col)
+
+# 企业 × 年份 的指数矩阵，多企业对比时按行号切片
+def get_company_pivot(dataset, index_columns):
+    with st.spinner('正在构建企业对比矩阵...'):
+        return dataset.derived('company_pivot', index_columns)
+
+# 每家企业的同比变化、年均复合增长率、滚动均值和结构突变（在企业 × 年份矩阵上向量化计算）
+def get_trends(dataset, index_columns, index_col):
+    with st.spinner('正在计算趋势指标...'):
+        return dataset.derived('trends', index_columns, index_col)
+
+# 长文本列不在常驻主表中，需要时才从文本缓存读取
+def load_text_frame(dataset, text_col):
+    with st.spinner('正在加载文本数据...'):
+        return dataset.derived('text_frame', text_col)
+
+# 全量词频索引在后台线程中构建（增量刷新），每个数据集版本只启动一次
+def get_keyword_index_job(dataset, text_col):
+    return dataset.derived_async('keyword_index', text_col)
+
+# 图表渲染结果的进程级缓存（有容量上限，按最近最少使用淘汰）
+@st.cache_resource(show_spinner=False)
+def get_chart_cache():
+    return ChartCache(max_entries=256)
+
+# 以下函数只负责绘图并返回Figure，渲染为PNG和关闭Figure由图表缓存统一处理
+def draw_correlation_heatmap(corr_matrix):
+    # 列数较多时不标注数值，图幅随列数增大
+    size = len(corr_matrix)
+    fig = plt.figure(figsize=(max(12, size * 0.6), max(8, size * 0.45)))
+    sns.heatmap(
+        corr_matrix,
+        annot=size <= ANNOTATE_MAX_COLUMNS,
+        cmap='coolwarm',
+        fmt='.2f',
+        linewidths=0.5,
+        cbar_kws={'shrink': 0.8}
+    )
+    plt.title('维度相关性热力图')
+    plt.tight_layout()
+    return fig
+
+def draw_index_distribution(index_col, distribution):
+    # 直方图和密度图（直方图计数和密度曲线均已在统计快照中计算）
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
+
+    # 直方图
+    edges = distribution['edges']
+    if edges is not None:
+        ax1.bar(edges[:-1], distribution['counts'], width=np.diff(edges), align='edge', alpha=0.7, color='#1f77b4')
+    ax1.set_title(f'{index_col}分布直方图')
+    ax1.set_xlabel(index_col)
+    ax1.set_ylabel('企业数量')
+    ax1.grid(True, alpha=0.3)
+
+    # 密度图
+    if distribution['density'] is not None:
+        ax2.fill_between(distribution['grid'], distribution['density'], color='#ff7f0e', alpha=0.7)
+        ax2.set_ylim(bottom=0)
+    ax2.set_title(f'{index_col}分布密度图')
+    ax2.set_xlabel(index_col)
+    ax2.set_ylabel('密度')
+    ax2.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    return fig
+
+def draw_company_line_chart(stock_code, index_col, company_name, history):
+    fig = plt.figure(figsize=(10, 6))
+    plt.plot(history['年份'], history[index_col], marker='o', linestyle='-', color='#1f77b4')
+    plt.title(f'{company_name}({stock_code})历年{index_col}')
+    plt.xlabel('年份')
+    plt.ylabel(index_col)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    return fig
+
+def draw_company_bar_chart(stock_code, index_col, company_name, history):
+    fig = plt.figure(figsize=(10, 6))
+    bars = plt.bar(history['年份'], history[index_col], color='#ff7f0e', alpha=0.8)
+    plt.title(f'{company_name}({stock_code})历年{index_col}')
+    plt.xlabel('年份')
+    plt.ylabel(index_col)
+    plt.grid(True, alpha=0.3, axis='y')
+
+    # 在柱状图上显示数值
+    for bar in bars:
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2., height + 0.01 * max(history[index_col]),
+                f'{height:.2f}', ha='center', va='bottom')
+
+    plt.tight_layout()
+    return fig
+
+def draw_word_frequency_chart(company_name, total_frequency):
+    fig = plt.figure(figsize=(12, 6))
+    categories = list(total_frequency.keys())
+    counts = list(total_frequency.values())
+    bars = plt.bar(categories, counts, color=['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd'])
+    plt.title(f'{company_name}数字技术词汇使用分布')
+    plt.xlabel('技术类别')
+    plt.ylabel('词汇出现次数')
+    plt.grid(True, alpha=0.3, axis='y')
+
+    # 在柱状图上显示数值
+    for bar in bars:
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2., height + 0.5, f'{height}', ha='center', va='bottom')
+
+    plt.tight_layout()
+    return fig
+
+# 地图HTML每个数据集版本只生成一次，所有会话共享；数据热更新后旧版本的地图按最近最少使用淘汰
+# 地区坐标来自离线对照表（统计快照中已关联），无法识别的地区不在地图上显示
+@st.cache_resource(show_spinner='正在生成地图...', max_entries=4)
+def build_region_maps(dataset_version, _region_stats, region_col, avg_index, std_index):
+    located_stats = _region_stats.dropna(subset=['纬度', '经度'])
+
+    # 这里使用folium创建中国地图
+    map_china = folium.Map(location=[35.8617, 104.1954], zoom_start=4, tiles='CartoDB positron')
+
+    for _, row in located_stats.iterrows():
+        # 创建详细的弹出信息
+        popup_content = f"""
+        <div style='width: 200px;'>
+            <h4>{row[region_col]}</h4>
+            <p>企业数量: <strong>{row['企业数量']}</strong></p>
+            <p>平均指数: <strong>{row['平均指数']:.2f}</strong></p>
+            <p>最低指数: <strong>{row['最低指数']:.2f}</strong></p>
+            <p>最高指数: <strong>{row['最高指数']:.2f}</strong></p>
+            <p>数据条数: <strong>{row['数据条数']}</strong></p>
+        </div>
+        """
+
+        # 使用不同颜色表示指数高低
+        if row['平均指数'] > avg_index + std_index:
+            color = 'green'
+        elif row['平均指数'] > avg_index:
+            color = 'blue'
+        elif row['平均指数'] > avg_index - std_index:
+            color = 'orange'
+        else:
+            color = 'red'
+
+        # 添加圆形标记，大小表示企业数量
+        folium.CircleMarker(
+            location=[row['纬度'], row['经度']],
+            radius=max(5, row['企业数量'] * 0.5),  # 企业数量越多，标记越大
+            popup=folium.Popup(popup_content, max_width=300),
+            tooltip=f"{row[region_col]}: {row['企业数量']}家企业",
+            color=color,
+            fill=True,
+            fill_color=color,
+            fill_opacity=0.6
+        ).add_to(map_china)
+
+    # 添加图层控制
+    folium.LayerControl().add_to(map_china)
+
+    # 热力图每个地区一个点，权重为该地区平均指数（按最大值归一化到0-1）
+    max_region_index = located_stats['平均指数'].max()
+    weights = located_stats['平均指数'] / max_region_index if max_region_index > 0 else located_stats['平均指数'] * 0
+    heatmap_data = np.column_stack([located_stats['纬度'], located_stats['经度'], weights.fillna(0)]).tolist()
+
+    # 创建热力图
+    heatmap_map = folium.Map(location=[35.8617, 104.1954], zoom_start=4, tiles='CartoDB positron')
+
+    # 添加热力图层
+    from folium.plugins import HeatMap
+
+    HeatMap(
+        heatmap_data,
+        min_opacity=0.3,
+        max_zoom=10,
+        radius=15,
+        blur=10,
+        gradient={0.4: 'blue', 0.65: 'lime', 0.8: 'yellow', 1: 'red'},
+        overlay=True,
+        control=True,
+        name='数字化转型指数热力图'
+    ).add_to(heatmap_map)
+
+    # 添加图层控制
+    folium.LayerControl().add_to(heatmap_map)
+
+    return map_china.get_root().render(), heatmap_map.get_root().render()
+
+# 加载Excel数据（存在多批次数据目录时按目录加载）
+DATA_SOURCE = default_source()
+
 def load_data():
     try:
         # 检查文件是否存在
-        file_path = '两版合并后的年报数据_完整版.xlsx'
+        file_path = DATA_SOURCE
         if not os.path.exists(file_path):
             st.error(f"文件不存在: {file_path}")
             st.write("当前工作目录:", os.getcwd())
             st.write("当前目录下的文件:", os.listdir('.'))
             return None
         
-        # 读取Excel文件
-        df = pd.read_excel(file_path)
-        
-        return df
+        # 读取Excel文件（优先使用列式缓存）；每次运行只取一次当前版本，本次运行内的数据不会中途切换
+        return get_dataset_watcher(file_path).current
     except Exception as e:
         st.error(f"加载数据失败: {e}")
         st.write("当前工作目录:", os.getcwd())
         st.write("当前目录下的文件:", os.listdir('.'))
         return None
 
+# 各部分的耗时、内存分配和图表缓存命中记录（在侧边栏“性能调试”中开启）
+chart_cache = get_chart_cache()
+profiler = SectionProfiler(
+    enabled=st.session_state.get('profile_enabled', False),
+    trace_memory=st.session_state.get('profile_memory', False),
+    counters=lambda: {'chart_cache_hits': chart_cache.hits, 'chart_cache_misses': chart_cache.misses}
+)
+# 登记本会话是否需要内存记录（其他会话仍在记录时不会停止 tracemalloc）
+set_memory_tracing(st.session_state.setdefault('profile_session_id', uuid.uuid4().hex), profiler.trace_memory)
+
 # 加载数据
-df = load_data()
-
-if df is not None:
-    # 设置词汇分类体系
-    VOCABULARY_CLASSIFICATION = {
-        '人工智能': [
-            '人工智能', 'AI', '机器学习', '深度学习', '神经网络', '自然语言处理', 
-            '计算机视觉', '图像理解', '语音识别', '智能决策', '算法模型', 
-            '知识图谱', '人机交互', '智能客服', '自动化决策'
-        ],
-        '大数据': [
-            '大数据', '数据挖掘', '数据分析', '数据处理', '数据治理', 
-            '数据仓库', '数据湖', '数据中台', '数据可视化', '预测分析', 
-            '实时数据', '数据集成', '数据资产', '数据安全'
-        ],
-        '云计算': [
-            '云计算', '云服务', '云平台', '云计算平台', 'IaaS', 'PaaS', 
-            'SaaS', '云存储', '云原生', '容器化', '微服务', '弹性计算', 
-            '分布式计算', '混合云', '边缘计算'
-        ],
-        '区块链': [
-            '区块链', '分布式账本', '智能合约', '加密货币', '去中心化', 
-            '共识机制', '哈希算法', '不可篡改', '数字资产', '区块链技术'
-        ],
-        '数字技术应用': [
-            '数字化转型', '数字经济', '数字金融', '数字营销', '数字制造', 
-            '工业互联网', '智能制造', '物联网', 'IoT', '数字孪生', 
-            '投资决策系统', '供应链金融', '智慧物流', '智能工厂', 
-            '工业4.0', '数字化生产', '智能供应链', '数字管理', '智能运营'
-        ]
-    }
-    
-    # 词频统计函数
-    def count_word_frequency(text, classification):
-        if pd.isna(text):
-            return {category: 0 for category in classification.keys()}
-        
-        text = str(text).lower()
-        frequency = {category: 0 for category in classification.keys()}
-        
-        for category, keywords in classification.items():
-            for keyword in keywords:
-                # 使用正则表达式进行精确匹配，避免子字符串匹配
-                frequency[category] += len(re.findall(r'\b' + re.escape(keyword.lower()) + r'\b', text))
-        
-        return frequency
-    
-    # 检查必要列是否存在
-    required_columns = ['股票代码', '年份', '企业名称']
-    index_columns = [col for col in df.columns if '数字化' in col or '转型' in col or '指数' in col]
+with profiler.section('数据加载'):
+    dataset = load_data()
+
+if dataset is not None:
+    df, dataset_version, data_meta = dataset.df, dataset.version, dataset.meta
+    profiler.start('统计与索引')
+    # 必要列检查和指数列、地区列、行业列、文本列的识别结果来自数据源清单
+    manifest = dataset.manifest
+    detected = manifest['roles']
+    index_columns = detected['index_columns']
     
-    missing_columns = [col for col in required_columns if col not in df.columns]
+    missing_columns = manifest['missing_required']
     
     if missing_columns:
         st.error(f"缺少必要的列: {', '.join(missing_columns)}")
@@ -111,430 +307,475 @@ if df is not None:
         st.warning("未找到包含'数字化'、'转型'或'指数'的列，请检查数据")
         st.stop()
     
-    # 获取唯一的股票代码和年份
-    stock_codes = df['股票代码'].unique().tolist()
-    years = df['年份'].unique().tolist()
+    region_col = detected['region_col']
+    industry_col = detected['industry_col']
+    text_col = detected['text_col']
+    keyword_index_job = get_keyword_index_job(dataset, text_col) if text_col else None
+    
+    # 全局统计快照（按数据集版本缓存并持久化）
+    stats_snapshot = get_statistics(dataset, tuple(index_columns), region_col)
     
-    # 排序
-    years.sort()
+    # 获取唯一的股票代码和年份（均已排序）
+    stock_index = get_stock_index(dataset)
+    stock_codes = stock_index.codes
+    years = stats_snapshot['years']
+    profiler.stop()
     
     # 侧边栏查询
     with st.sidebar:
         st.title('查询面板')
         st.write('请选择以下参数进行查询')
         
-        selected_stock = st.selectbox('股票代码', stock_codes)
+        # 按股票代码、企业名称或拼音首字母搜索，选择框中只放匹配度最高的若干家企业
+        search_index = get_search_index(dataset)
+        stock_query = st.text_input('搜索企业', key='stock_query', placeholder='股票代码、企业名称或拼音首字母')
+        stock_options = search_index.search(stock_query)
+        if stock_query and not stock_options:
+            st.caption('未找到匹配的企业')
+        if not stock_options:
+            # 未输入或没有匹配时列出前若干家企业
+            stock_options = stock_codes[:SEARCH_LIMIT]
+        # 当前选择始终保留在选项中，输入搜索词不会切换已选的企业
+        current_stock = st.session_state.get('selected_stock')
+        if current_stock in search_index and current_stock not in stock_options:
+            stock_options = stock_options + [current_stock]
+        selected_stock = st.selectbox('股票代码', stock_options, format_func=search_index.label, key='selected_stock')
         selected_year = st.selectbox('年份', years)
         
+        # 多企业对比（在“企业查询”标签页中叠加显示）：选项同样来自上面的搜索结果，已选的企业始终保留
+        company_pivot = get_company_pivot(dataset, tuple(index_columns))
+        compare_selected = [code for code in st.session_state.get('compare_stocks', []) if code in search_index]
+        compare_stocks = st.multiselect('对比企业', list(dict.fromkeys(compare_selected + stock_options)),
+                                        format_func=search_index.label, key='compare_stocks',
+                                        max_selections=50, placeholder='在上方搜索后选择多家企业进行对比')
+        
         # 查询按钮
         search_button = st.button('查询', key='search_button', help='点击查询数据')
     
+        # 图表缓存命中情况（页面渲染完成后再填写）
+        chart_cache_panel = st.expander('图表缓存')
+        
+        # 性能调试（默认关闭，记录在页面渲染完成后显示）
+        debug_panel = st.expander('性能调试')
+        with debug_panel:
+            st.checkbox('记录各部分耗时', key='profile_enabled')
+            st.checkbox('同时记录内存分配（tracemalloc，较慢）', key='profile_memory')
+        
+        # 当前数据集版本；数据源更新失败时继续使用该版本
+        dataset_watcher = get_dataset_watcher(DATA_SOURCE)
+        st.caption(f"数据版本 {dataset_version}（加载于 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(dataset.loaded_at))}）")
+        if dataset_watcher.error is not None:
+            st.warning(f"数据源更新失败，继续使用当前版本: {dataset_watcher.error}")
+    
     # 主页面内容
     st.title('企业数字化转型指数查询系统')
     
-    # 计算统计指标
+    # 统计指标（来自全局统计快照）
     index_col = index_columns[0]
-    avg_index = df[index_col].mean() if index_col in df.columns else 0
-    max_index = df[index_col].max() if index_col in df.columns else 0
-    min_index = df[index_col].min() if index_col in df.columns else 0
-    median_index = df[index_col].median() if index_col in df.columns else 0
-    std_index = df[index_col].std() if index_col in df.columns else 0
+    index_stats = index_summary(stats_snapshot, index_col)
+    avg_index = index_stats['平均值']
+    max_index = index_stats['最大值']
+    min_index = index_stats['最小值']
+    median_index = index_stats['中位数']
+    std_index = index_stats['标准差']
     
-    # 显示统计概览
-    st.subheader('统计概览')
-    col1, col2, col3, col4, col5, col6 = st.columns(6)
-    with col1:
-        st.metric(label="总记录数", value=len(df))
-    with col2:
-        st.metric(label="企业数量", value=len(df['股票代码'].unique()))
-    with col3:
-        st.metric(label="年份范围", value=f"{min(years)}-{max(years)}")
-    with col4:
-        st.metric(label="平均指数", value=f"{avg_index:.2f}")
-    with col5:
-        st.metric(label="最高指数", value=f"{max_index:.2f}")
-    with col6:
-        st.metric(label="最低指数", value=f"{min_index:.2f}")
+    # 按股票代码查询（索引切片，已按年份排序）
+    stock_data = stock_index.history(selected_stock)
+    company_name = stock_data['企业名称'].iloc[0] if not stock_data.empty else str(selected_stock)
     
-    # 显示更多统计信息
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric(label="中位数指数", value=f"{median_index:.2f}")
-    with col2:
-        st.metric(label="指数标准差", value=f"{std_index:.2f}")
-    with col3:
-        st.metric(label="数据年份数", value=len(years))
+    # 页面按标签页拆分，只运行当前打开的标签页；切换股票或年份时全局面板不会重新计算
+    tab_overview, tab_distribution, tab_region, tab_query, tab_words = st.tabs(
+        ['统计概览', '相关性与分布', '地理分布', '企业查询', '词频分析'],
+        key='main_tabs',
+        on_change='rerun'
+    )
     
-    # 数据概览
-    st.subheader('数据概览')
-    col1, col2 = st.columns([2, 1])
-    with col1:
-        st.dataframe(df.sample(10))
-    with col2:
-        st.write("**数据结构**")
-        st.write(f"行数: {df.shape[0]}")
-        st.write(f"列数: {df.shape[1]}")
-        st.write(f"\n**主要列名**")
-        st.write("\n".join(df.columns[:10]))
-        if len(df.columns) > 10:
-            st.write(f"... 等 {len(df.columns)} 列")
+    with tab_overview:
+        if tab_overview.open:
+            profiler.start('统计概览')
+            # 显示统计概览
+            st.subheader('统计概览')
+            col1, col2, col3, col4, col5, col6 = st.columns(6)
+            with col1:
+                st.metric(label="总记录数", value=stats_snapshot['record_count'])
+            with col2:
+                st.metric(label="企业数量", value=stats_snapshot['company_count'])
+            with col3:
+                st.metric(label="年份范围", value=f"{min(years)}-{max(years)}")
+            with col4:
+                st.metric(label="平均指数", value=f"{avg_index:.2f}")
+            with col5:
+                st.metric(label="最高指数", value=f"{max_index:.2f}")
+            with col6:
+                st.metric(label="最低指数", value=f"{min_index:.2f}")
     
-    # 维度相关性热力图
-    st.subheader('维度相关性热力图')
-    # 获取数值型列
-    numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
+            # 显示更多统计信息
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric(label="中位数指数", value=f"{median_index:.2f}")
+            with col2:
+                st.metric(label="指数标准差", value=f"{std_index:.2f}")
+            with col3:
+                st.metric(label="数据年份数", value=len(years))
     
-    if len(numeric_columns) > 1:
-        # 计算相关系数矩阵
-        corr_matrix = df[numeric_columns].corr()
-        
-        # 创建热力图
-        plt.figure(figsize=(12, 8))
-        sns.heatmap(
-            corr_matrix, 
-            annot=True, 
-            cmap='coolwarm', 
-            fmt='.2f', 
-            linewidths=0.5,
-            cbar_kws={'shrink': 0.8}
-        )
-        plt.title('维度相关性热力图')
-        plt.tight_layout()
-        st.pyplot(plt)
-    else:
-        st.info("数据中数值型列不足，无法生成相关性热力图")
+            # 全市场趋势排行（按年均复合增长率，首末记录相隔不足 MIN_TREND_YEARS 年的企业除外）
+            st.subheader('全市场趋势排行')
+            trends = get_trends(dataset, tuple(index_columns), index_col)
+            st.caption(f"按{index_col}的{CAGR_COLUMN}排序，仅包含首末记录相隔至少 {MIN_TREND_YEARS} 年的企业")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write("**增长最快**")
+                st.dataframe(trends.top_movers(10))
+            with col2:
+                st.write("**下降最快**")
+                st.dataframe(trends.top_movers(10, ascending=True))
     
-    # 数字化转型指数分布
-    st.subheader('数字化转型指数分布')
-    index_col = index_columns[0]
+            # 数据概览
+            st.subheader('数据概览')
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                st.dataframe(df.sample(10))
+            with col2:
+                st.write("**数据结构**")
+                st.write(f"行数: {df.shape[0]}")
+                st.write(f"列数: {df.shape[1]}")
+                memory = data_meta['memory']
+                st.write(f"内存占用: {memory['before'] / 2**20:.1f} MB → {memory['after'] / 2**20:.1f} MB")
+                if memory['text_columns']:
+                    st.write(f"长文本列按需加载: {', '.join(memory['text_columns'])} ({memory['text'] / 2**20:.1f} MB)")
+                st.write(f"\n**主要列名**")
+                st.write("\n".join(df.columns[:10]))
+                if len(df.columns) > 10:
+                    st.write(f"... 等 {len(df.columns)} 列")
     
-    if index_col in df.columns:
-        # 直方图和密度图
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
-        
-        # 直方图
-        ax1.hist(df[index_col], bins=20, alpha=0.7, color='#1f77b4')
-        ax1.set_title(f'{index_col}分布直方图')
-        ax1.set_xlabel(index_col)
-        ax1.set_ylabel('企业数量')
-        ax1.grid(True, alpha=0.3)
-        
-        # 密度图
-        sns.kdeplot(df[index_col], ax=ax2, fill=True, color='#ff7f0e', alpha=0.7)
-        ax2.set_title(f'{index_col}分布密度图')
-        ax2.set_xlabel(index_col)
-        ax2.set_ylabel('密度')
-        ax2.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
-        st.pyplot(fig)
-        
-        # 数字化转型指数详细统计
-        st.subheader('数字化转型指数详细统计')
-        index_stats = {
-            '平均值': df[index_col].mean(),
-            '中位数': df[index_col].median(),
-            '标准差': df[index_col].std(),
-            '最小值': df[index_col].min(),
-            '最大值': df[index_col].max(),
-            '25%分位数': df[index_col].quantile(0.25),
-            '75%分位数': df[index_col].quantile(0.75)
-        }
-        
-        col1, col2, col3 = st.columns(3)
-        for i, (stat_name, value) in enumerate(index_stats.items()):
-            with [col1, col2, col3][i % 3]:
-                st.info(f"**{stat_name}**\n{value:.4f}")
-    else:
-        st.info(f"未找到{index_col}列，无法生成指数分布")
+    with tab_distribution:
+        if tab_distribution.open:
+            profiler.start('相关性热力图')
+            # 维度相关性热力图
+            st.subheader('维度相关性热力图')
+            # 相关系数引擎已在统计快照中计算，这里只取所选列的子矩阵
+            correlation = stats_snapshot['correlation']
     
-    # 地理分布地图（优化）
-    st.subheader('企业地理分布')
-    # 检查是否有地区相关列
-    region_columns = [col for col in df.columns if any(keyword in col for keyword in ['地区', '省份', '城市', '地域'])]
+            if correlation is not None:
+                col1, col2, col3 = st.columns([3, 1, 1])
+                with col1:
+                    corr_columns = st.multiselect('参与分析的列', correlation.columns, default=correlation.columns,
+                                                  key='corr_columns')
+                with col2:
+                    corr_clustered = st.checkbox('按聚类排序', value=True, key='corr_clustered',
+                                                 help='相关性强的列排在一起')
+                with col3:
+                    corr_top_k = st.number_input('相关性最强的列对数', min_value=1, max_value=100, value=10,
+                                                 key='corr_top_k')
+                if len(corr_columns) > 1:
+                    if corr_clustered:
+                        corr_columns = correlation.clustered_columns(corr_columns)
+                    heatmap_png = chart_cache.get_or_render(('correlation_heatmap', None, tuple(corr_columns), dataset_version),
+                                                            draw_correlation_heatmap, correlation.matrix(corr_columns))
+                    st.image(heatmap_png, width='stretch')
+                    st.write(f"**相关性最强的 {corr_top_k} 对列**（按相关系数绝对值排序）")
+                    st.dataframe(correlation.top_pairs(corr_top_k, corr_columns), hide_index=True)
+                else:
+                    st.info("请至少选择两列")
+            else:
+                st.info("数据中数值型列不足，无法生成相关性热力图")
+        
+            # 数字化转型指数分布
+            profiler.start('指数分布')
+            st.subheader('数字化转型指数分布')
+        
+            if index_col in df.columns:
+                # 可切换到其他指数列或词频数、维度等数值列，只绘制快照中预先算好的数组
+                distributions = stats_snapshot['distributions']
+                distribution_col = st.selectbox('分布指标', list(distributions), key='distribution_col')
+                distribution_png = chart_cache.get_or_render(('index_distribution', None, distribution_col, dataset_version),
+                                                             draw_index_distribution, distribution_col,
+                                                             distributions[distribution_col])
+                st.image(distribution_png, width='stretch')
+        
+                # 数字化转型指数详细统计
+                st.subheader('数字化转型指数详细统计')
+                col1, col2, col3 = st.columns(3)
+                for i, (stat_name, value) in enumerate(index_stats.items()):
+                    with [col1, col2, col3][i % 3]:
+                        st.info(f"**{stat_name}**\n{value:.4f}")
+            else:
+                st.info(f"未找到{index_col}列，无法生成指数分布")
+        
+    with tab_region:
+        if tab_region.open:
+            profiler.start('地理分布')
+            # 地理分布地图（优化）
+            st.subheader('企业地理分布')
+            if region_col:
+                # 各地区企业数量和平均指数（来自统计快照）
+                region_stats = stats_snapshot['region_stats']
     
-    if region_columns:
-        region_col = region_columns[0]
-        
-        # 统计各地区企业数量和平均指数
-        region_stats = df.groupby(region_col).agg({
-            '股票代码': 'nunique',
-            index_col: ['mean', 'min', 'max', 'count']
-        }).reset_index()
-        
-        # 重命名列
-        region_stats.columns = [region_col, '企业数量', '平均指数', '最低指数', '最高指数', '数据条数']
-        
-        # 显示地区分布统计
-        st.write(f"基于 {region_col} 列的企业分布和指数统计")
-        st.dataframe(region_stats)
-        
-        # 创建地图
-        st.subheader('企业分布和指数地图')
-        # 这里使用folium创建中国地图
-        map_china = folium.Map(location=[35.8617, 104.1954], zoom_start=4, tiles='CartoDB positron')
-        
-        # 添加企业标记（这里需要实际的经纬度数据，暂时使用示例位置）
-        # 为了演示，我们使用随机经纬度
-        for _, row in region_stats.iterrows():
-            # 这里应该使用实际的经纬度数据
-            # 由于数据中可能没有经纬度，我们使用随机位置作为示例
-            lat = 20 + np.random.rand() * 30  # 20-50°N
-            lon = 70 + np.random.rand() * 60  # 70-130°E
-            
-            # 创建详细的弹出信息
-            popup_content = f"""
-            <div style='width: 200px;'>
-                <h4>{row[region_col]}</h4>
-                <p>企业数量: <strong>{row['企业数量']}</strong></p>
-                <p>平均指数: <strong>{row['平均指数']:.2f}</strong></p>
-                <p>最低指数: <strong>{row['最低指数']:.2f}</strong></p>
-                <p>最高指数: <strong>{row['最高指数']:.2f}</strong></p>
-                <p>数据条数: <strong>{row['数据条数']}</strong></p>
-            </div>
-            """
-            
-            # 使用不同颜色表示指数高低
-            if row['平均指数'] > avg_index + std_index:
-                color = 'green'
-            elif row['平均指数'] > avg_index:
-                color = 'blue'
-            elif row['平均指数'] > avg_index - std_index:
-                color = 'orange'
+                # 显示地区分布统计
+                st.write(f"基于 {region_col} 列的企业分布和指数统计")
+                st.dataframe(region_stats)
+        
+                unlocated = region_stats.loc[region_stats['纬度'].isna(), region_col].astype(str).tolist()
+                if unlocated:
+                    st.caption(f"以下地区未能匹配坐标，未在地图中显示: {', '.join(unlocated)}")
+                marker_map_html, heatmap_map_html = build_region_maps(
+                    dataset_version, region_stats, region_col, avg_index, std_index
+                )
+
+                # 在Streamlit中显示地图
+                st.subheader('企业分布和指数地图')
+                st.iframe(marker_map_html, height=600)
+
+                # 数字化转型指数热力分布
+                st.subheader('数字化转型指数热力分布')
+                st.write("热力图说明：颜色越红表示数字化转型指数越高，颜色越蓝表示指数越低")
+                st.iframe(heatmap_map_html, height=600)
             else:
-                color = 'red'
+                st.info("数据中未找到地区相关列，无法生成地理分布地图和热力分布")
+                st.write("建议在数据中添加'地区'、'省份'或'城市'列以启用此功能")
+        
+    with tab_query:
+        if tab_query.open:
+            profiler.start('企业查询')
+            st.header('查询结果')
+        
+            # 显示该股票的基本信息
+            if not stock_data.empty:
+                # 公司信息卡片
+                with st.container():
+                    st.subheader('公司基本信息')
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.info(f"**企业名称**\n{company_name}")
+                    with col2:
+                        st.info(f"**股票代码**\n{selected_stock}")
+                    with col3:
+                        st.info(f"**数据年份**\n{', '.join(map(str, stock_data['年份'].unique()))}")
             
-            # 添加圆形标记，大小表示企业数量
-            folium.CircleMarker(
-                location=[lat, lon],
-                radius=max(5, row['企业数量'] * 0.5),  # 企业数量越多，标记越大
-                popup=folium.Popup(popup_content, max_width=300),
-                tooltip=f"{row[region_col]}: {row['企业数量']}家企业",
-                color=color,
-                fill=True,
-                fill_color=color,
-                fill_opacity=0.6
-            ).add_to(map_china)
-        
-        # 添加图层控制
-        folium.LayerControl().add_to(map_china)
-        
-        # 在Streamlit中显示地图
-        st_folium(map_china, width=1000, height=600)
-        
-        # 数字化转型指数热力分布
-        st.subheader('数字化转型指数热力分布')
-        
-        # 创建热力图数据
-        heatmap_data = []
-        
-        # 为每个地区生成多个点，密度与企业数量相关
-        for _, row in region_stats.iterrows():
-            # 生成经纬度（示例数据）
-            base_lat = 20 + np.random.rand() * 30  # 20-50°N
-            base_lon = 70 + np.random.rand() * 60  # 70-130°E
+                # 获取指定年份的数据
+                year_data = stock_index.row(selected_stock, selected_year)
+                if not year_data.empty:
+                    if index_col in year_data.columns:
+                        index_value = year_data[index_col].iloc[0]
+                        # 排名、百分位和较上期变化（预先计算，按行位置读取）
+                        rankings = get_rankings(dataset, index_col, industry_col, region_col)
+                        ranking = ranking_summary(rankings, stock_index.position(selected_stock, selected_year))
             
-            # 根据企业数量生成多个点
-            num_points = min(row['企业数量'], 10)  # 限制最大点数为10
+                        # 指数展示卡片
+                        with st.container():
+                            st.subheader(f'{selected_year}年数字化转型指数')
+                            col1, col2 = st.columns(2)
+                            with col1:
+                                st.metric(
+                                    label=f"{selected_year}年{index_col}",
+                                    value=f"{index_value:.2f}" if isinstance(index_value, (int, float)) else index_value,
+                                    delta=f"{ranking['delta']:+.2f}（较{ranking['previous_year']}年）" if ranking['delta'] is not None else None
+                                )
+                            with col2:
+                                for group in ranking['groups']:
+                                    st.write(f"**{group['对比组']}排名**: 第 {group['排名']} / {group['企业数']} 名，"
+                                             f"百分位 {group['百分位']:.1f}")
+                    else:
+                        st.warning(f"未找到{index_col}列")
+                else:
+                    st.warning(f"未找到{selected_stock}在{selected_year}年的数据")
+            else:
+                st.warning(f"未找到股票代码{selected_stock}的数据")
             
-            for _ in range(num_points):
-                # 添加一些随机偏移
-                lat = base_lat + (np.random.rand() - 0.5) * 2
-                lon = base_lon + (np.random.rand() - 0.5) * 2
-                
-                # 数字越大，热力越强
-                heatmap_data.append([lat, lon, row['平均指数']])
+            # 可视化部分
+            st.markdown('---')
+            st.header('数据可视化')
         
-        # 创建热力图
-        heatmap_map = folium.Map(location=[35.8617, 104.1954], zoom_start=4, tiles='CartoDB positron')
+            if index_col in stock_data.columns:
+                # 折线图和柱状图并排显示（索引返回的数据已按年份排序）
+                col1, col2 = st.columns(2)
         
-        # 添加热力图层
-        from folium.plugins import HeatMap
-        
-        HeatMap(
-            heatmap_data,
-            min_opacity=0.3,
-            max_zoom=10,
-            radius=15,
-            blur=10,
-            max_val=max(df[index_col]) if index_col in df.columns else 100,
-            gradient={0.4: 'blue', 0.65: 'lime', 0.8: 'yellow', 1: 'red'},
-            overlay=True,
-            control=True,
-            name='数字化转型指数热力图'
-        ).add_to(heatmap_map)
-        
-        # 添加图层控制
-        folium.LayerControl().add_to(heatmap_map)
-        
-        # 在Streamlit中显示热力图
-        st.write("热力图说明：颜色越红表示数字化转型指数越高，颜色越蓝表示指数越低")
-        st_folium(heatmap_map, width=1000, height=600)
-    else:
-        st.info("数据中未找到地区相关列，无法生成地理分布地图和热力分布")
-        st.write("建议在数据中添加'地区'、'省份'或'城市'列以启用此功能")
-    
-    # 查询结果
-    if search_button or True:  # 默认显示所有数据
-        st.markdown('---')
-        st.header('查询结果')
-        
-        # 按股票代码过滤
-        stock_data = df[df['股票代码'] == selected_stock]
+                with col1:
+                    st.subheader('历年指数折线图')
+                    line_png = chart_cache.get_or_render(('company_line', selected_stock, index_col, dataset_version),
+                                                         draw_company_line_chart, selected_stock, index_col, company_name, stock_data)
+                    st.image(line_png, width='stretch')
         
-        # 显示该股票的基本信息
-        if not stock_data.empty:
-            # 获取企业名称
-            company_name = stock_data['企业名称'].iloc[0]
-            
-            # 公司信息卡片
-            with st.container():
-                st.subheader('公司基本信息')
-                col1, col2, col3 = st.columns(3)
+                with col2:
+                    st.subheader('历年指数柱状图')
+                    bar_png = chart_cache.get_or_render(('company_bar', selected_stock, index_col, dataset_version),
+                                                        draw_company_bar_chart, selected_stock, index_col, company_name, stock_data)
+                    st.image(bar_png, width='stretch')
+            else:
+                st.warning(f"未找到{index_col}列，无法生成趋势图")
+        
+            # 趋势指标（按版本预先计算，按行号读取）
+            trends = get_trends(dataset, tuple(index_columns), index_col)
+            trend_summary = trends.company_summary(selected_stock)
+            if trend_summary is not None and pd.notna(trend_summary['最新年份']):
+                st.subheader('趋势指标')
+                col1, col2, col3, col4 = st.columns(4)
                 with col1:
-                    st.info(f"**企业名称**\n{company_name}")
+                    cagr = trend_summary[CAGR_COLUMN]
+                    st.metric(label=f"{CAGR_COLUMN}（{trend_summary['起始年份']}-{trend_summary['最新年份']}年）",
+                              value=f"{cagr:.2f}" if pd.notna(cagr) else '-')
                 with col2:
-                    st.info(f"**股票代码**\n{selected_stock}")
+                    latest_change = trend_summary['最新同比变化']
+                    st.metric(label=f"{trend_summary['最新年份']}年同比变化",
+                              value=f"{latest_change:+.2f}" if pd.notna(latest_change) else '-')
                 with col3:
-                    st.info(f"**数据年份**\n{', '.join(map(str, sorted(stock_data['年份'].unique())))}")
-            
-            # 获取指定年份的数据
-            year_data = stock_data[stock_data['年份'] == selected_year]
-            if not year_data.empty:
-                # 使用动态检测到的索引列
-                index_col = index_columns[0]
-                if index_col in year_data.columns:
-                    index_value = year_data[index_col].iloc[0]
-                    
-                    # 指数展示卡片
-                    with st.container():
-                        st.subheader(f'{selected_year}年数字化转型指数')
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric(
-                                label=f"{selected_year}年{index_col}", 
-                                value=f"{index_value:.2f}" if isinstance(index_value, (int, float)) else index_value,
-                                delta=None
-                            )
-                else:
-                    st.warning(f"未找到{index_col}列")
-            else:
-                st.warning(f"未找到{selected_stock}在{selected_year}年的数据")
-        else:
-            st.warning(f"未找到股票代码{selected_stock}的数据")
-        
-        # 可视化部分
-        st.markdown('---')
-        st.header('数据可视化')
-        
-        # 使用动态检测到的索引列
-        index_col = index_columns[0]
-        
-        if index_col in stock_data.columns:
-            # 按年份排序
-            stock_data_sorted = stock_data.sort_values('年份')
-            
-            # 折线图和柱状图并排显示
-            col1, col2 = st.columns(2)
+                    mean_change = trend_summary['平均同比变化']
+                    st.metric(label='平均同比变化', value=f"{mean_change:+.2f}" if pd.notna(mean_change) else '-')
+                with col4:
+                    last_break = trend_summary['最近突变年份']
+                    st.metric(label='结构突变次数', value=int(trend_summary['结构突变次数']),
+                              delta=f"最近 {last_break} 年" if pd.notna(last_break) else None, delta_color='off')
+                st.dataframe(trends.history(selected_stock), hide_index=True)
+        
+            # 多企业对比：从企业 × 年份矩阵中取出所选企业，叠加在同一张交互图中
+            if compare_stocks:
+                st.markdown('---')
+                st.header('多企业对比')
+                compare_col = st.selectbox('对比指标', index_columns, key='compare_col') if len(index_columns) > 1 else index_col
+                compare_codes = list(dict.fromkeys([selected_stock] + compare_stocks))
+                compare_values = company_pivot.values(compare_col, compare_codes)
+                fig = go.Figure()
+                for code, row in zip(compare_codes, compare_values):
+                    fig.add_trace(go.Scatter(x=company_pivot.years, y=row, mode='lines+markers',
+                                             name=company_pivot.label(code), connectgaps=False))
+                fig.update_layout(xaxis_title='年份', yaxis_title=compare_col, hovermode='x unified',
+                                  height=500, legend_title_text='企业')
+                st.plotly_chart(fig, width='stretch')
+                st.dataframe(company_pivot.frame(compare_col, compare_codes))
+        
+            # 数据表格
+            st.markdown('---')
+            st.header('详细数据')
+            st.dataframe(stock_data)
+        
+            # 提供下载功能
+            st.markdown('---')
+            profiler.start('数据导出')
+            st.header('数据下载')
+            # 下载内容在点击时才生成
+            st.download_button(
+                label="下载当前股票数据 (CSV)",
+                data=lambda: stock_data.to_csv(index=False),
+                file_name=f"{company_name}_{selected_stock}_数字化转型数据.csv",
+                mime="text/csv"
+            )
             
+            # 批量导出：按地区、行业、年份范围筛选，点击下载时才分块生成，相同条件直接复用已生成的文件
+            st.subheader('批量导出')
+            export_tables = {
+                '年报数据': lambda: stock_index.frame,
+                '企业排名': lambda: pd.concat([
+                    stock_index.frame[['股票代码', '企业名称', '年份'] + [col for col in [industry_col, region_col] if col] + [index_col]],
+                    get_rankings(dataset, index_col, industry_col, region_col)
+                ], axis=1),
+            }
+            if keyword_index_job is not None and keyword_index_job.done() and keyword_index_job.exception() is None:
+                export_tables['关键词词频'] = lambda: keyword_index_job.result().export_frame(
+                    df[['股票代码', '年份', '企业名称'] + [col for col in [industry_col, region_col] if col]])
+            col1, col2, col3 = st.columns(3)
             with col1:
-                st.subheader('历年指数折线图')
-                plt.figure(figsize=(10, 6))
-                plt.plot(stock_data_sorted['年份'], stock_data_sorted[index_col], marker='o', linestyle='-', color='#1f77b4')
-                plt.title(f'{company_name}({selected_stock})历年{index_col}')
-                plt.xlabel('年份')
-                plt.ylabel(index_col)
-                plt.grid(True, alpha=0.3)
-                plt.tight_layout()
-                st.pyplot(plt)
-            
+                export_table = st.selectbox('导出内容', list(export_tables), key='export_table')
+                export_format = st.selectbox('导出格式', list(EXPORT_FORMATS), key='export_format')
             with col2:
-                st.subheader('历年指数柱状图')
-                plt.figure(figsize=(10, 6))
-                bars = plt.bar(stock_data_sorted['年份'], stock_data_sorted[index_col], color='#ff7f0e', alpha=0.8)
-                plt.title(f'{company_name}({selected_stock})历年{index_col}')
-                plt.xlabel('年份')
-                plt.ylabel(index_col)
-                plt.grid(True, alpha=0.3, axis='y')
-                
-                # 在柱状图上显示数值
-                for bar in bars:
-                    height = bar.get_height()
-                    plt.text(bar.get_x() + bar.get_width()/2., height + 0.01 * max(stock_data_sorted[index_col]),
-                            f'{height:.2f}', ha='center', va='bottom')
-                
-                plt.tight_layout()
-                st.pyplot(plt)
-        else:
-            st.warning(f"未找到{index_col}列，无法生成趋势图")
-        
-        # 词频统计
-        st.markdown('---')
-        st.header('数字技术词频分析')
-        
-        # 检查是否有文本内容列
-        text_columns = [col for col in df.columns if any(keyword in col for keyword in ['内容', '年报', '描述', '文本'])]
-        
-        if text_columns:
-            text_col = text_columns[0]
-            st.write(f"基于 {text_col} 列的词频统计")
+                export_filters = {'年份': st.select_slider('年份范围', options=years, value=(years[0], years[-1]), key='export_years')}
+                if region_col:
+                    export_filters[region_col] = st.multiselect(region_col, column_values(df, region_col), key='export_regions')
+            with col3:
+                if industry_col:
+                    export_filters[industry_col] = st.multiselect(industry_col, column_values(df, industry_col), key='export_industries')
+        
+            def export_data(table=export_table, filters=export_filters, export_format=export_format):
+                path = get_export(DATA_SOURCE, dataset_version, table, export_tables[table], filters, export_format,
+                                  index_col=index_col)
+                with open(path, 'rb') as f:
+                    return f.read()
+        
+            st.download_button(
+                label=f"下载{export_table} ({export_format})",
+                data=export_data,
+                file_name=export_file_name(export_table, export_filters, export_format),
+                mime=EXPORT_FORMATS[export_format][1],
+                key='export_download'
+            )
             
-            # 检查该股票是否有文本数据
-            stock_text_data = stock_data[stock_data[text_col].notna()]
+    with tab_words:
+        if tab_words.open:
+            profiler.start('词频分析')
+            # 词频统计
+            st.header('数字技术词频分析')
             
-            if not stock_text_data.empty:
-                # 计算该股票的总词频
-                total_frequency = {category: 0 for category in VOCABULARY_CLASSIFICATION.keys()}
-                
-                for _, row in stock_text_data.iterrows():
-                    text = row[text_col]
-                    frequency = count_word_frequency(text, VOCABULARY_CLASSIFICATION)
-                    for category, count in frequency.items():
-                        total_frequency[category] += count
-                
-                # 词频柱状图
-                st.subheader('数字技术词汇分布')
-                plt.figure(figsize=(12, 6))
-                categories = list(total_frequency.keys())
-                counts = list(total_frequency.values())
-                bars = plt.bar(categories, counts, color=['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd'])
-                plt.title(f'{company_name}数字技术词汇使用分布')
-                plt.xlabel('技术类别')
-                plt.ylabel('词汇出现次数')
-                plt.grid(True, alpha=0.3, axis='y')
+            if text_col:
+                st.write(f"基于 {text_col} 列的词频统计")
                 
-                # 在柱状图上显示数值
-                for bar in bars:
-                    height = bar.get_height()
-                    plt.text(bar.get_x() + bar.get_width()/2., height + 0.5, f'{height}', ha='center', va='bottom')
-                
-                plt.tight_layout()
-                st.pyplot(plt)
-                
-                # 词频表格
-                st.subheader('词频统计详情')
-                frequency_df = pd.DataFrame(list(total_frequency.items()), columns=['技术类别', '词频数'])
-                st.dataframe(frequency_df)
-            else:
-                st.warning(f"未找到{company_name}的文本数据")
-        else:
-            st.warning("未找到包含文本内容的列，请检查数据")
-        
-        # 数据表格
-        st.markdown('---')
-        st.header('详细数据')
-        st.dataframe(stock_data)
+                # 全量词频索引构建完成后直接读取，否则临时统计该股票的文本
+                keyword_index = None
+                if not keyword_index_job.done():
+                    st.caption('全量词频索引正在后台构建，当前结果为该企业文本的即时统计')
+                elif keyword_index_job.exception() is not None:
+                    st.warning(f"全量词频索引构建失败: {keyword_index_job.exception()}")
+                else:
+                    keyword_index = keyword_index_job.result()
         
-        # 提供下载功能
-        st.markdown('---')
-        st.header('数据下载')
-        csv = stock_data.to_csv(index=False)
-        st.download_button(
-            label="下载当前股票数据 (CSV)",
-            data=csv,
-            file_name=f"{company_name}_{selected_stock}_数字化转型数据.csv",
-            mime="text/csv"
-        )
+                # 检查该股票是否有文本数据（没有索引时才从文本缓存读取原文）
+                if keyword_index is not None:
+                    has_text = bool((keyword_index.keys['股票代码'] == selected_stock).any())
+                else:
+                    text_frame = load_text_frame(dataset, text_col)
+                    stock_text_data = text_frame[(text_frame['股票代码'] == selected_stock) & text_frame[text_col].notna()]
+                    has_text = not stock_text_data.empty
+        
+                if has_text:
+                    if keyword_index is not None:
+                        total_frequency = keyword_index.company_totals(selected_stock).to_dict()
+                    else:
+                        # 计算该股票的总词频（所有年份文本一次批量统计）
+                        matcher = get_matcher(VOCABULARY_CLASSIFICATION)
+                        total_frequency = matcher.count_series(stock_text_data[text_col]).sum().astype(int).to_dict()
+        
+                    # 词频柱状图
+                    st.subheader('数字技术词汇分布')
+                    frequency_png = chart_cache.get_or_render(('word_frequency', selected_stock, None, dataset_version),
+                                                              draw_word_frequency_chart, company_name, total_frequency)
+                    st.image(frequency_png, width='stretch')
+        
+                    # 词频表格
+                    st.subheader('词频统计详情')
+                    frequency_df = pd.DataFrame(list(total_frequency.items()), columns=['技术类别', '词频数'])
+                    st.dataframe(frequency_df)
+                else:
+                    st.warning(f"未找到{company_name}的文本数据")
+        
+                # 全市场词频趋势和行业/地区汇总（来自全量词频索引）
+                if keyword_index is not None:
+                    st.subheader('全市场数字技术词频年度趋势')
+                    st.line_chart(keyword_index.yearly_trend())
+                    for group_col in [industry_col, region_col]:
+                        if group_col:
+                            st.subheader(f'按{group_col}汇总的词频')
+                            st.dataframe(keyword_index.group_totals(df, group_col))
+            else:
+                st.warning("未找到包含文本内容的列，请检查数据")
+
+    profiler.finish()
+
+    with chart_cache_panel:
+        cache_stats = chart_cache.stats()
+        st.write(f"命中: {cache_stats['hits']}  未命中: {cache_stats['misses']}  命中率: {cache_stats['hit_rate']:.0%}")
+        st.write(f"缓存图表: {cache_stats['entries']}/{cache_stats['max_entries']}  占用: {cache_stats['bytes'] / 1024:.0f} KB")
+
+    with debug_panel:
+        if profiler.enabled:
+            # 保留本会话最近的记录，供导出为 JSON lines
+            profile_history = st.session_state.setdefault('profile_history', [])
+            profile_history.extend(profiler.records)
+            del profile_history[:-1000]
+            st.dataframe(pd.DataFrame(profiler.records).drop(columns=['run_id', 'timestamp']), hide_index=True)
+            st.download_button(
+                label="导出记录 (JSON lines)",
+                data=to_jsonl(profile_history),
+                file_name="profile.jsonl",
+                mime="application/jsonl"
+            )
 
 else:
     st.error("数据加载失败，请检查Excel文件")
@@ -0,0 +1,117 @@
+"""指数分布面板用的直方图和核密度估计。
+
+核密度估计先把样本线性分箱到等距网格上，再用 FFT 与高斯核做卷积，
+计算量只与网格点数有关，不再是 样本数 × 网格点数。
+带宽（Scott 规则）、网格范围（两端各延伸 3 倍带宽）与 seaborn kdeplot 的默认设置一致。
+结果随全局统计快照按数据集版本计算并持久化，面板只绘制预先算好的数组。
+直方图计数和分箱权重都可以逐块累加，按年份分区的数据目录用 DistributionAccumulator 逐个分区累计，
+已知全局样本数、极值和标准差时结果与一次性计算相同。
+"""
+import numpy as np
+
+HISTOGRAM_BINS = 20
+KDE_GRID_SIZE = 512
+# 长尾分布（如词频数）的带宽相对取值范围很小，网格加密到间距不超过带宽的 1/4，但不超过该上限
+KDE_MAX_GRID_SIZE = 8192
+KDE_STEPS_PER_BANDWIDTH = 4
+KDE_CUT = 3
+# 高斯核在 4 倍带宽之外可以忽略
+KDE_KERNEL_RADIUS = 4
+
+
+def finite_values(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values[np.isfinite(values)]
+
+
+def scott_bandwidth(values):
+    """Scott 规则的带宽：样本标准差 × n^(-1/5)。"""
+    if len(values) < 2:
+        return 0.0
+    return float(np.std(values, ddof=1) * len(values) ** (-1 / 5))
+
+
+def linear_binning(values, start, step, grid_size):
+    """把每个样本按距离分摊到相邻的两个网格点上，返回各网格点的权重（总和为样本数）。"""
+    position = (values - start) / step
+    left = np.clip(np.floor(position).astype(np.int64), 0, grid_size - 2)
+    fraction = np.clip(position - left, 0, 1)
+    return (np.bincount(left, weights=1 - fraction, minlength=grid_size)
+            + np.bincount(left + 1, weights=fraction, minlength=grid_size))
+
+
+def kde_grid(count, minimum, maximum, bandwidth, grid_size=KDE_GRID_SIZE, cut=KDE_CUT):
+    """核密度估计的等距网格；样本不足两个或带宽为 0 时返回 None。"""
+    if count < 2 or not bandwidth > 0:
+        return None
+    low, high = minimum - cut * bandwidth, maximum + cut * bandwidth
+    grid_size = max(grid_size, min(KDE_MAX_GRID_SIZE, int(np.ceil((high - low) / bandwidth * KDE_STEPS_PER_BANDWIDTH)) + 1))
+    return np.linspace(low, high, grid_size)
+
+
+def smooth_weights(weights, grid, bandwidth, count):
+    """把网格上的分箱权重与高斯核做 FFT 卷积，返回密度。"""
+    grid_size = len(grid)
+    step = grid[1] - grid[0]
+    # 核按循环卷积的方式排列：kernel[m] 和 kernel[-m] 对应网格距离 m
+    radius = min(grid_size - 1, int(np.ceil(KDE_KERNEL_RADIUS * bandwidth / step)))
+    offsets = np.arange(radius + 1) * step / bandwidth
+    half = np.exp(-0.5 * offsets ** 2) / np.sqrt(2 * np.pi)
+    size = 1 << int(np.ceil(np.log2(grid_size + radius)))
+    kernel = np.zeros(size)
+    kernel[:radius + 1] = half
+    kernel[size - radius:] = half[:0:-1]
+
+    smoothed = np.fft.irfft(np.fft.rfft(weights, size) * np.fft.rfft(kernel), size)[:grid_size]
+    return np.clip(smoothed, 0, None) / (count * bandwidth)
+
+
+def binned_kde(values, grid_size=KDE_GRID_SIZE, cut=KDE_CUT, bandwidth=None):
+    """返回 (网格, 密度)；样本不足两个或全部相同时返回 (None, None)。"""
+    values = finite_values(values)
+    bandwidth = scott_bandwidth(values) if bandwidth is None else bandwidth
+    grid = kde_grid(len(values), values.min(), values.max(), bandwidth, grid_size, cut) if len(values) else None
+    if grid is None:
+        return None, None
+    weights = linear_binning(values, grid[0], grid[1] - grid[0], len(grid))
+    return grid, smooth_weights(weights, grid, bandwidth, len(values))
+
+
+def compute_distribution(values, bins=HISTOGRAM_BINS, grid_size=KDE_GRID_SIZE):
+    values = finite_values(values)
+    counts, edges = np.histogram(values, bins=bins) if len(values) else (np.zeros(bins, dtype=np.int64), None)
+    grid, density = binned_kde(values, grid_size)
+    return {'count': len(values), 'counts': counts, 'edges': edges, 'grid': grid, 'density': density}
+
+
+def compute_distributions(df, columns, bins=HISTOGRAM_BINS, grid_size=KDE_GRID_SIZE):
+    """各列的直方图计数和核密度曲线。"""
+    return {col: compute_distribution(df[col].to_numpy(dtype=np.float64, na_value=np.nan), bins, grid_size)
+            for col in columns}
+
+
+class DistributionAccumulator:
+    """逐块累加的直方图和核密度：直方图边界和核密度网格由全部数据的个数、极值和标准差预先确定，
+    直方图计数和线性分箱权重都可以按块相加，结果与一次性计算相同。"""
+
+    def __init__(self, count, minimum, maximum, std, bins=HISTOGRAM_BINS, grid_size=KDE_GRID_SIZE):
+        self.count = count
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.edges = np.histogram_bin_edges([minimum, maximum], bins=bins) if count else None
+        self.bandwidth = float(std * count ** (-1 / 5)) if count >= 2 else 0.0
+        self.grid = kde_grid(count, minimum, maximum, self.bandwidth, grid_size) if count else None
+        self.weights = np.zeros(len(self.grid)) if self.grid is not None else None
+
+    def update(self, values):
+        values = finite_values(values)
+        if not len(values):
+            return self
+        self.counts += np.histogram(values, bins=self.edges)[0]
+        if self.grid is not None:
+            self.weights += linear_binning(values, self.grid[0], self.grid[1] - self.grid[0], len(self.grid))
+        return self
+
+    def result(self):
+        density = smooth_weights(self.weights, self.grid, self.bandwidth, self.count) if self.grid is not None else None
+        return {'count': self.count, 'counts': self.counts, 'edges': self.edges, 'grid': self.grid, 'density': density}
@@ -0,0 +1,282 @@
+"""数据源热更新：后台监视数据源，数据变化后增量更新派生数据，再原子切换数据集版本。
+
+监视线程定期检查数据源各文件的 mtime 和大小，连续两次检查结果一致（文件已写完）后在后台重新加载，
+按 (股票代码, 年份) 的行哈希与当前版本比对，得到新增、删除和修改的行以及涉及的企业、年份。
+当前版本上已经算过的派生数据（查询索引、统计快照、排名、企业对比矩阵、趋势指标、词频索引）
+按比对结果只更新受影响的部分，全部就绪后才替换当前版本；在此之前各会话继续使用旧版本。
+列结构变化时无法比对，派生数据在后台全部重新计算后再切换。
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analysis import read_text_frame
+from company_pivot import CompanyPivot
+from data_stats import load_or_compute_statistics, update_statistics
+from dataset_store import DatasetStore
+from keyword_index import build_keyword_index, refresh_keyword_index, save_index
+from keyword_engine import VOCABULARY_CLASSIFICATION
+from peer_ranking import compute_rankings, update_rankings
+from schema_inspector import load_manifest, source_fingerprint
+from search_index import build_search_index
+from stock_index import StockIndex
+from trends import CompanyTrends
+
+KEY_COLUMNS = ['股票代码', '年份']
+WATCH_INTERVAL = 5
+
+# 耗时较长的派生数据（如词频索引）在后台线程中构建
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='derived-data')
+
+
+def key_hashes(df):
+    """每个 (股票代码, 年份) 的行哈希（同一键有多行时按行哈希求和，与行的顺序无关）。"""
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    keys = df[KEY_COLUMNS].astype(object).assign(_hash=hashes)
+    return keys.groupby(KEY_COLUMNS, sort=False)['_hash'].sum()
+
+
+class DatasetDiff:
+    def __init__(self, added, removed, changed, old_rows, new_rows):
+        # added/removed/changed 为 (股票代码, 年份) 的 MultiIndex；old_rows/new_rows 为这些键在新旧版本中的行
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.old_rows = old_rows
+        self.new_rows = new_rows
+        self.companies = self.values('股票代码')
+        self.years = self.values('年份')
+
+    def __len__(self):
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    def values(self, col):
+        """有变化的行在新旧版本中该列的取值。"""
+        return set(self.old_rows[col].dropna().tolist()) | set(self.new_rows[col].dropna().tolist())
+
+
+def diff_datasets(old, new):
+    """按 (股票代码, 年份) 比对两个版本的主表；列结构不同时返回 None。"""
+    if list(old.df.columns) != list(new.df.columns):
+        return None
+    old_hashes, new_hashes = old.key_hashes(), new.key_hashes()
+    # 按位置对齐（reindex 会因缺失值把 uint64 哈希转为浮点数）
+    positions = old_hashes.index.get_indexer(new_hashes.index)
+    found = positions >= 0
+    differs = old_hashes.to_numpy()[np.maximum(positions, 0)] != new_hashes.to_numpy()
+    added = new_hashes.index[~found]
+    changed = new_hashes.index[found & differs]
+    removed = old_hashes.index.difference(new_hashes.index)
+
+    def rows(df, keys):
+        index = pd.MultiIndex.from_frame(df[KEY_COLUMNS].astype(object))
+        return df[index.isin(keys)]
+
+    return DatasetDiff(added, removed, changed,
+                       rows(old.df, removed.append(changed)), rows(new.df, added.append(changed)))
+
+
+def _build_stock_index(dataset):
+    return StockIndex(dataset.df, dataset.store)
+
+
+def _build_statistics(dataset, index_columns, region_col):
+    return load_or_compute_statistics(dataset.df, dataset.version, dataset.source, index_columns, region_col,
+                                      store=dataset.store)
+
+
+def _update_statistics(dataset, previous, old, diff, index_columns, region_col):
+    changed_regions = diff.values(region_col) if region_col else None
+    return update_statistics(previous, dataset.df, dataset.version, dataset.source, index_columns, region_col,
+                             changed_regions, store=dataset.store)
+
+
+def _build_rankings(dataset, index_col, industry_col, region_col):
+    return compute_rankings(dataset.derived('stock_index').frame, index_col, industry_col, region_col)
+
+
+def _update_rankings(dataset, previous, old, diff, index_col, industry_col, region_col):
+    return update_rankings(previous, old.derived('stock_index').frame, dataset.derived('stock_index').frame,
+                           diff.years, diff.companies, index_col, industry_col, region_col)
+
+
+def _build_company_pivot(dataset, index_columns):
+    return CompanyPivot(dataset.derived('stock_index'), index_columns)
+
+
+def _update_company_pivot(dataset, previous, old, diff, index_columns):
+    return previous.updated(dataset.derived('stock_index'), diff.companies)
+
+
+def _build_trends(dataset, index_columns, index_col):
+    return CompanyTrends(dataset.derived('company_pivot', index_columns), index_col)
+
+
+def _build_search_index(dataset):
+    return build_search_index(dataset.derived('stock_index'))
+
+
+def _build_text_frame(dataset, text_col):
+    return read_text_frame(dataset.df, dataset.meta, dataset.source, text_col)
+
+
+def _build_keyword_index(dataset, text_col):
+    return refresh_keyword_index(_build_text_frame(dataset, text_col), text_col, dataset.source)
+
+
+def _update_keyword_index(dataset, previous, old, diff, text_col):
+    # 词频索引按文本哈希复用未变化的行，只统计新增或修改的文本
+    index = build_keyword_index(_build_text_frame(dataset, text_col), text_col, previous=previous)
+    save_index(index, dataset.source, VOCABULARY_CLASSIFICATION)
+    return index
+
+
+# 派生数据名 -> (构建函数, 增量更新函数)；没有增量更新函数的派生数据在新版本中按需重新构建
+DERIVED = {
+    'stock_index': (_build_stock_index, lambda dataset, previous, old, diff: _build_stock_index(dataset)),
+    'statistics': (_build_statistics, _update_statistics),
+    'rankings': (_build_rankings, _update_rankings),
+    'company_pivot': (_build_company_pivot, _update_company_pivot),
+    # 趋势指标在（已增量更新的）企业 × 年份矩阵上整体向量化计算，开销很小，直接重新计算
+    'trends': (_build_trends, lambda dataset, previous, old, diff, *args: _build_trends(dataset, *args)),
+    'search_index': (_build_search_index, lambda dataset, previous, old, diff: _build_search_index(dataset)),
+    'text_frame': (_build_text_frame, None),
+    'keyword_index': (_build_keyword_index, _update_keyword_index),
+}
+
+
+class DatasetVersion:
+    """一个数据集版本：主表、缓存元数据、数据源清单，以及按需构建、在所有会话间共享的派生数据。"""
+
+    def __init__(self, source, df, meta, manifest):
+        self.source = source
+        self.df = df
+        self.meta = meta
+        self.manifest = manifest
+        # 数据目录按年份分区存储，企业历年数据和统计快照直接读分区
+        self.store = DatasetStore(source, meta['store']) if meta.get('store') else None
+        # 以源文件内容哈希作为数据集版本号，派生数据按版本缓存
+        self.version = meta['source']['sha256'][:16]
+        self.loaded_at = time.time()
+        self._values = {}
+        self._futures = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._key_hashes = None
+
+    def key_hashes(self):
+        if self._key_hashes is None:
+            self._key_hashes = key_hashes(self.df)
+        return self._key_hashes
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def derived(self, name, *args):
+        """返回派生数据，首次使用时构建；多个会话同时请求时只构建一次。"""
+        key = (name,) + args
+        if key not in self._values:
+            with self._key_lock(key):
+                if key not in self._values:
+                    self._values[key] = DERIVED[name][0](self, *args)
+        return self._values[key]
+
+    def derived_async(self, name, *args):
+        """在后台线程中构建派生数据，返回 Future。"""
+        key = (name,) + args
+        with self._lock:
+            if key not in self._futures:
+                self._futures[key] = _executor.submit(self.derived, name, *args)
+            return self._futures[key]
+
+    def precompute_from(self, old, diff):
+        """按旧版本上已经算过的派生数据预先准备本版本的派生数据：能增量更新的按比对结果更新，
+        列结构变化（diff 为 None）时重新构建；失败的派生数据留待使用时再构建。"""
+        for key, previous in list(old._values.items()):
+            name, args = key[0], key[1:]
+            build, update = DERIVED[name]
+            if key in self._values or (diff is not None and update is None):
+                continue
+            try:
+                with self._key_lock(key):
+                    if key not in self._values:
+                        self._values[key] = (build(self, *args) if diff is None
+                                             else update(self, previous, old, diff, *args))
+            except Exception:
+                self._values.pop(key, None)
+
+
+class DatasetWatcher:
+    """监视数据源，数据变化后在后台准备新版本并替换 current。"""
+
+    def __init__(self, source, loader, interval=WATCH_INTERVAL):
+        self.source = source
+        self.loader = loader
+        self.interval = interval
+        self.error = None
+        self.reloads = 0
+        self.last_diff = None
+        self._lock = threading.Lock()
+        # 先记录数据源状态再加载，加载期间发生的变化会在下一次检查时发现
+        self._state = source_fingerprint(source)
+        self._pending = None
+        self.current = self._load()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='dataset-watcher', daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        df, meta = self.loader(self.source)
+        return DatasetVersion(self.source, df, meta, load_manifest(self.source))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """检查一次数据源；状态连续两次一致且与当前版本不同时重新加载。返回是否切换了版本。"""
+        try:
+            state = source_fingerprint(self.source)
+        except OSError:
+            # 文件正在被替换
+            return False
+        if state == self._state:
+            self._pending = None
+            return False
+        if state != self._pending:
+            self._pending = state
+            return False
+        return self.reload(state)
+
+    def reload(self, state=None):
+        """加载数据源，增量准备派生数据后替换当前版本；失败时保留旧版本并记录错误。"""
+        with self._lock:
+            state = source_fingerprint(self.source) if state is None else state
+            current = self.current
+            try:
+                dataset = self._load()
+                if dataset.version == current.version:
+                    # 只是 mtime 变化，内容未变
+                    self._state = state
+                    return False
+                diff = diff_datasets(current, dataset)
+                dataset.precompute_from(current, diff)
+            except Exception as e:
+                self.error = e
+                # 同一状态不再重试，等数据源再次变化
+                self._state = state
+                return False
+            self.last_diff = diff
+            self.error = None
+            self._state = state
+            self._pending = None
+            self.reloads += 1
+            self.current = dataset
+            return True
+
+    def stop(self):
+        self._stop.set()
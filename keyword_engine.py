@@ -0,0 +1,132 @@
+"""数字技术关键词词频统计。
+
+所有关键词编译为一个交替正则，每篇文本只扫描一遍即可得到各关键词和各类别的出现次数。
+匹配规则为“最左最长、不重叠”：文本中的“云计算平台”只记为“云计算平台”一次，
+不再同时计入“云计算”。中文关键词不加词边界（原先的 \\b 在连续中文中几乎无法命中），
+英文关键词两侧要求不是字母或数字，避免“AI”命中“email”之类的子串。
+"""
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# 词汇分类体系
+VOCABULARY_CLASSIFICATION = {
+    '人工智能': [
+        '人工智能', 'AI', '机器学习', '深度学习', '神经网络', '自然语言处理',
+        '计算机视觉', '图像理解', '语音识别', '智能决策', '算法模型',
+        '知识图谱', '人机交互', '智能客服', '自动化决策'
+    ],
+    '大数据': [
+        '大数据', '数据挖掘', '数据分析', '数据处理', '数据治理',
+        '数据仓库', '数据湖', '数据中台', '数据可视化', '预测分析',
+        '实时数据', '数据集成', '数据资产', '数据安全'
+    ],
+    '云计算': [
+        '云计算', '云服务', '云平台', '云计算平台', 'IaaS', 'PaaS',
+        'SaaS', '云存储', '云原生', '容器化', '微服务', '弹性计算',
+        '分布式计算', '混合云', '边缘计算'
+    ],
+    '区块链': [
+        '区块链', '分布式账本', '智能合约', '加密货币', '去中心化',
+        '共识机制', '哈希算法', '不可篡改', '数字资产', '区块链技术'
+    ],
+    '数字技术应用': [
+        '数字化转型', '数字经济', '数字金融', '数字营销', '数字制造',
+        '工业互联网', '智能制造', '物联网', 'IoT', '数字孪生',
+        '投资决策系统', '供应链金融', '智慧物流', '智能工厂',
+        '工业4.0', '数字化生产', '智能供应链', '数字管理', '智能运营'
+    ]
+}
+
+_ASCII_WORD = re.compile(r'[0-9a-z]')
+
+
+def _keyword_pattern(keyword):
+    pattern = re.escape(keyword)
+    if _ASCII_WORD.match(keyword[0]):
+        pattern = r'(?<![0-9a-z])' + pattern
+    if _ASCII_WORD.match(keyword[-1]):
+        pattern = pattern + r'(?![0-9a-z])'
+    return pattern
+
+
+class KeywordMatcher:
+    def __init__(self, classification):
+        self.categories = list(classification.keys())
+
+        # 关键词统一转小写后去重，同一关键词可属于多个类别
+        self.keyword_categories = {}
+        for category, keywords in classification.items():
+            for keyword in keywords:
+                self.keyword_categories.setdefault(keyword.lower(), []).append(category)
+        self.keywords = list(self.keyword_categories.keys())
+
+        # 关键词 × 类别 的计数矩阵，用于把关键词词频汇总为类别词频
+        self.membership = pd.DataFrame(0, index=self.keywords, columns=self.categories, dtype=np.int64)
+        for keyword, categories in self.keyword_categories.items():
+            for category in categories:
+                self.membership.loc[keyword, category] += 1
+
+        # 长关键词排在前面，保证在同一位置优先匹配最长的关键词
+        ordered = sorted(self.keywords, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(_keyword_pattern(keyword) for keyword in ordered))
+
+    def find_terms(self, text):
+        if pd.isna(text):
+            return []
+        return self.pattern.findall(str(text).lower())
+
+    def count_terms(self, text):
+        counts = dict.fromkeys(self.keywords, 0)
+        for term in self.find_terms(text):
+            counts[term] += 1
+        return counts
+
+    def count(self, text):
+        frequency = dict.fromkeys(self.categories, 0)
+        for term in self.find_terms(text):
+            for category in self.keyword_categories[term]:
+                frequency[category] += 1
+        return frequency
+
+    def count_terms_series(self, texts):
+        """批量统计关键词词频：输入文本Series，返回 行 × 关键词 的计数DataFrame（索引与输入一致）。"""
+        texts = pd.Series(texts)
+        found = texts.reset_index(drop=True).map(self.find_terms)
+        terms = found.explode().dropna()
+        if terms.empty:
+            counts = pd.DataFrame(0, index=range(len(texts)), columns=self.keywords, dtype=np.int64)
+        else:
+            counts = (terms.groupby(level=0).value_counts().unstack(fill_value=0)
+                      .reindex(index=range(len(texts)), columns=self.keywords, fill_value=0)
+                      .astype(np.int64))
+        counts.index = texts.index
+        counts.columns.name = None
+        return counts
+
+    def count_series(self, texts):
+        """批量统计类别词频：输入文本Series，返回 行 × 类别 的计数DataFrame（索引与输入一致）。"""
+        return self.categories_from_terms(self.count_terms_series(texts))
+
+    def categories_from_terms(self, term_counts):
+        return term_counts[self.keywords].dot(self.membership)
+
+
+def _freeze(classification):
+    return tuple((category, tuple(keywords)) for category, keywords in classification.items())
+
+
+@lru_cache(maxsize=8)
+def _cached_matcher(frozen):
+    return KeywordMatcher({category: list(keywords) for category, keywords in frozen})
+
+
+def get_matcher(classification=VOCABULARY_CLASSIFICATION):
+    """同一词汇表只编译一次匹配器。"""
+    return _cached_matcher(_freeze(classification))
+
+
+def count_word_frequency(text, classification=VOCABULARY_CLASSIFICATION):
+    return get_matcher(classification).count(text)
@@ -0,0 +1,160 @@
+"""全量关键词词频索引（股票代码 × 年份 × 关键词/类别）。
+
+对工作簿文本列的每一行统计一次关键词和类别词频，保存为按 (股票代码, 年份) 索引的紧凑表，
+应用从该表读取企业合计、行业/地区汇总和年度趋势，不再扫描原始文本。
+重建时按文本哈希比对，只重新统计新增或内容变化的行。
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_cache import HAS_PYARROW, cache_dir_for, read_frame, write_frame
+from keyword_engine import VOCABULARY_CLASSIFICATION, get_matcher
+
+INDEX_KEY = ['股票代码', '年份']
+HASH_COLUMN = '文本哈希'
+TERM_PREFIX = '关键词:'
+CATEGORY_PREFIX = '类别:'
+INDEX_FORMAT_VERSION = 1
+
+# 后台构建任务共用一个工作线程
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='keyword-index')
+
+
+class KeywordIndex:
+    def __init__(self, keys, terms, categories, recomputed=0):
+        # 三个表按行位置对齐：keys 含 股票代码、年份、文本哈希
+        self.keys = keys.reset_index(drop=True)
+        self.terms = terms.reset_index(drop=True)
+        self.categories = categories.reset_index(drop=True)
+        self.recomputed = recomputed
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _with_keys(self, table, extra=None):
+        frame = pd.concat([self.keys[INDEX_KEY], table], axis=1)
+        if extra is not None:
+            frame = frame.merge(extra, on=INDEX_KEY, how='left')
+        return frame
+
+    def company_totals(self, stock_code, use_terms=False):
+        table = self.terms if use_terms else self.categories
+        return table[(self.keys['股票代码'] == stock_code).to_numpy()].sum().astype(int)
+
+    def yearly_trend(self):
+        frame = self._with_keys(self.categories).drop(columns='股票代码')
+        return frame.groupby('年份').sum().sort_index()
+
+    def export_frame(self, extra=None):
+        """类别词频和各关键词词频的完整表，extra 为按 (股票代码, 年份) 关联的附加列。"""
+        return self._with_keys(pd.concat([self.categories, self.terms.add_prefix(TERM_PREFIX)], axis=1), extra)
+
+    def group_totals(self, df, group_col):
+        # 行业、地区等属性仍在主表中，按 (股票代码, 年份) 关联后汇总
+        frame = self._with_keys(self.categories, df[INDEX_KEY + [group_col]])
+        return frame.drop(columns=INDEX_KEY).groupby(group_col, observed=True).sum()
+
+
+def vocabulary_signature(classification):
+    payload = json.dumps(classification, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def text_hashes(texts):
+    return pd.util.hash_pandas_object(texts.astype('string').fillna(''), index=False).to_numpy()
+
+
+def index_paths(file_path):
+    base = os.path.join(cache_dir_for(file_path), os.path.basename(file_path) + '.keywords')
+    return base + ('.parquet' if HAS_PYARROW else '.npz'), base + '.meta.json'
+
+
+def save_index(index, file_path, classification):
+    data_path, meta_path = index_paths(file_path)
+    frame = pd.concat([
+        index.keys,
+        index.terms.add_prefix(TERM_PREFIX),
+        index.categories.add_prefix(CATEGORY_PREFIX),
+    ], axis=1)
+    schema = write_frame(frame, data_path)
+    meta = {
+        'format_version': INDEX_FORMAT_VERSION,
+        'vocabulary': vocabulary_signature(classification),
+        'schema': schema,
+    }
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def load_index(file_path, classification):
+    """读取磁盘上的词频索引，词汇表或格式不一致时返回 None。"""
+    data_path, meta_path = index_paths(file_path)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if (meta.get('format_version') != INDEX_FORMAT_VERSION
+                or meta.get('vocabulary') != vocabulary_signature(classification)):
+            return None
+        frame = read_frame(data_path, meta['schema'])
+    except (OSError, ValueError, KeyError):
+        return None
+
+    term_columns = [col for col in frame.columns if col.startswith(TERM_PREFIX)]
+    category_columns = [col for col in frame.columns if col.startswith(CATEGORY_PREFIX)]
+    terms = frame[term_columns].rename(columns=lambda col: col[len(TERM_PREFIX):])
+    categories = frame[category_columns].rename(columns=lambda col: col[len(CATEGORY_PREFIX):])
+    return KeywordIndex(frame[INDEX_KEY + [HASH_COLUMN]], terms, categories)
+
+
+def build_keyword_index(df, text_col, classification=VOCABULARY_CLASSIFICATION, previous=None):
+    """统计每行文本的词频；传入 previous 时复用文本哈希未变化的行。"""
+    matcher = get_matcher(classification)
+    rows = df[INDEX_KEY + [text_col]].drop_duplicates(INDEX_KEY, keep='last').reset_index(drop=True)
+    keys = rows[INDEX_KEY].copy()
+    keys[HASH_COLUMN] = text_hashes(rows[text_col])
+
+    values = np.zeros((len(keys), len(matcher.keywords)), dtype=np.int32)
+    changed = np.ones(len(keys), dtype=bool)
+    if previous is not None and len(previous):
+        # 按 (股票代码, 年份) 对齐旧索引，哈希一致的行直接复用
+        old = previous.keys.assign(_row=np.arange(len(previous)))
+        aligned = keys.merge(old, on=INDEX_KEY, how='left', suffixes=('', '_old'))
+        reuse = (aligned[HASH_COLUMN + '_old'] == aligned[HASH_COLUMN]).to_numpy()
+        old_rows = aligned.loc[reuse, '_row'].astype(np.int64).to_numpy()
+        values[reuse] = previous.terms[matcher.keywords].to_numpy()[old_rows]
+        changed = ~reuse
+
+    if changed.any():
+        counts = matcher.count_terms_series(rows.loc[changed, text_col])
+        values[changed] = counts[matcher.keywords].to_numpy()
+
+    terms = pd.DataFrame(values, columns=matcher.keywords)
+    categories = matcher.categories_from_terms(terms).astype(np.int32)
+    return KeywordIndex(keys, terms, categories, recomputed=int(changed.sum()))
+
+
+def refresh_keyword_index(df, text_col, file_path, classification=VOCABULARY_CLASSIFICATION):
+    """读取已有索引做增量刷新，结果写回磁盘。"""
+    previous = load_index(file_path, classification)
+    index = build_keyword_index(df, text_col, classification, previous)
+    if previous is None or index.recomputed or len(previous) != len(index):
+        save_index(index, file_path, classification)
+    return index
+
+
+def start_keyword_index_job(df, text_col, file_path, classification=VOCABULARY_CLASSIFICATION):
+    """在后台线程中刷新词频索引，返回 Future。
+
+    df 也可以是返回文本表的函数，这样读取文本缓存的开销也放在后台线程中。
+    """
+    def run():
+        texts = df() if callable(df) else df
+        return refresh_keyword_index(texts, text_col, file_path, classification)
+    return _executor.submit(run)
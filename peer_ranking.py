@@ -0,0 +1,99 @@
+"""企业在同年、同年同行业、同年同地区企业中的排名和百分位，以及与上一期相比的变化。
+
+每个数据集版本用 groupby 的 rank/transform 一次性计算全部 (股票代码, 年份)，
+结果与 StockIndex 排序后的表逐行对齐，查询时按行位置直接读取，不再扫描数据。
+"""
+import numpy as np
+import pandas as pd
+
+PEER_GROUPS = ['同年', '同行业', '同地区']
+
+
+def peer_groups(industry_col=None, region_col=None):
+    """各对比组的分组列，没有行业列或地区列时不计算对应的组。"""
+    groups = {'同年': ['年份']}
+    if industry_col:
+        groups['同行业'] = ['年份', industry_col]
+    if region_col:
+        groups['同地区'] = ['年份', region_col]
+    return groups
+
+
+def group_rankings(frame, index_col, industry_col=None, region_col=None):
+    """各对比组的 排名（指数从高到低，并列取最小名次）、百分位（0-100，越高越靠前）、企业数。"""
+    values = frame[index_col].astype(np.float64)
+    result = pd.DataFrame(index=frame.index)
+    for label, by in peer_groups(industry_col, region_col).items():
+        grouped = values.groupby([frame[col] for col in by], observed=True)
+        result[f'{label}排名'] = grouped.rank(method='min', ascending=False).astype('Int32')
+        result[f'{label}百分位'] = grouped.rank(method='average', pct=True) * 100
+        result[f'{label}企业数'] = grouped.transform('count').astype('Int32')
+    return result
+
+
+def previous_period(frame, index_col):
+    """上期年份、上期指数、较上期变化，上期为该企业上一条指数非空的记录。"""
+    values = frame[index_col].astype(np.float64)
+    result = pd.DataFrame(index=frame.index)
+    # 按 (股票代码, 年份) 排序后取同一企业上一条指数非空的记录（StockIndex 的表已经有序）
+    ordered = frame[['股票代码', '年份']].assign(_value=values).sort_values(['股票代码', '年份'], kind='stable')
+    ordered = ordered[ordered['_value'].notna()]
+    by_company = ordered.groupby('股票代码', observed=True, sort=False)
+    previous_year = by_company['年份'].shift(1)
+    previous_value = by_company['_value'].shift(1)
+    result['上期年份'] = previous_year.reindex(frame.index).astype('Int32')
+    result['上期指数'] = previous_value.reindex(frame.index)
+    result['较上期变化'] = values - result['上期指数']
+    return result
+
+
+def compute_rankings(frame, index_col, industry_col=None, region_col=None):
+    """返回与 frame 逐行对齐的排名表：各对比组的排名、百分位、企业数，以及上期年份、上期指数、较上期变化。"""
+    return pd.concat([group_rankings(frame, index_col, industry_col, region_col),
+                      previous_period(frame, index_col)], axis=1)
+
+
+def update_rankings(previous, previous_frame, frame, years, companies, index_col, industry_col=None, region_col=None):
+    """数据更新后的增量计算：对比组都在同一年份内，只重算有变化的年份；上期变化只重算有变化的企业。
+
+    previous 与 previous_frame 逐行对齐，years、companies 为有行新增、删除或修改的年份和股票代码。
+    """
+    keys = ['股票代码', '年份']
+    if len(previous_frame) == len(frame) and all(
+            np.array_equal(previous_frame[col].to_numpy(), frame[col].to_numpy()) for col in keys):
+        # 只修改了数值、没有增删行时两张表逐行对应
+        positions = np.arange(len(frame))
+    else:
+        old_keys = pd.MultiIndex.from_frame(previous_frame[keys].astype(object))
+        positions = old_keys.get_indexer(pd.MultiIndex.from_frame(frame[keys].astype(object)))
+    result = previous.iloc[np.maximum(positions, 0)].set_axis(frame.index)
+
+    # 新增的行所在的年份和企业也要重算
+    added = positions < 0
+    years = set(years) | set(frame.loc[added, '年份'].tolist())
+    companies = set(companies) | set(frame.loc[added, '股票代码'].tolist())
+    for mask, compute in [
+        (frame['年份'].isin(years), lambda rows: group_rankings(rows, index_col, industry_col, region_col)),
+        (frame['股票代码'].isin(companies), lambda rows: previous_period(rows, index_col)),
+    ]:
+        if mask.any():
+            changes = compute(frame[mask]).reindex(frame.index)
+            for col in changes.columns:
+                result[col] = changes[col].where(mask, result[col])
+    return result
+
+
+def ranking_summary(rankings, position):
+    """某一行的排名信息（按对比组），position 为 StockIndex 排序后表中的行位置。"""
+    row = rankings.iloc[position]
+    groups = []
+    for label in PEER_GROUPS:
+        if f'{label}排名' in rankings.columns and pd.notna(row[f'{label}排名']):
+            groups.append({'对比组': label, '排名': int(row[f'{label}排名']), '企业数': int(row[f'{label}企业数']),
+                           '百分位': float(row[f'{label}百分位'])})
+    previous_year = row['上期年份']
+    return {
+        'groups': groups,
+        'previous_year': int(previous_year) if pd.notna(previous_year) else None,
+        'delta': float(row['较上期变化']) if pd.notna(row['较上期变化']) else None,
+    }
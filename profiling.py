@@ -0,0 +1,114 @@
+"""看板各部分的耗时、内存分配和缓存命中记录。
+
+每次脚本运行（rerun）按部分记录墙钟耗时、tracemalloc 峰值分配和图表缓存的命中/未命中次数，
+可在侧边栏查看，也可导出为 JSON lines。未开启时 start/stop 直接返回，几乎没有开销。
+tracemalloc 是进程级的，多个会话同时开启内存记录时峰值会相互叠加，只适合排查时临时打开；
+开启过的会话都关闭内存记录、或超过 TRACING_TTL 秒没有运行（如标签页已关闭）后才停止 tracemalloc。
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+# 设置该环境变量后，每次运行的记录同时追加写入该文件
+PROFILE_LOG_ENV = 'DT_PROFILE_LOG'
+
+# 开启了内存记录的会话超过该秒数没有再运行时视为已关闭
+TRACING_TTL = 300
+
+# 开启了内存记录的会话 -> 最近一次运行的时间
+_tracing_sessions = {}
+_tracing_lock = threading.Lock()
+
+
+class SectionProfiler:
+    def __init__(self, enabled=False, trace_memory=False, counters=None):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        # counters 返回累计计数（如图表缓存的 hits/misses），每个部分记录其增量
+        self.counters = counters
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records = []
+        self._current = None
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _counter_values(self):
+        return dict(self.counters()) if self.counters else {}
+
+    def start(self, name):
+        """开始记录一个部分；上一个部分尚未结束时先结束它。"""
+        if not self.enabled:
+            return
+        self.stop()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self._current = (name, time.perf_counter(), self._counter_values(),
+                         tracemalloc.get_traced_memory()[0] if self.trace_memory else 0)
+
+    def stop(self):
+        if not self.enabled or self._current is None:
+            return
+        name, started, counters, memory_start = self._current
+        self._current = None
+        record = {
+            'run_id': self.run_id,
+            'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+            'section': name,
+            'wall_ms': round((time.perf_counter() - started) * 1000, 3),
+        }
+        if self.trace_memory:
+            record['peak_alloc_kb'] = round(max(tracemalloc.get_traced_memory()[1] - memory_start, 0) / 1024, 1)
+        for key, value in self._counter_values().items():
+            record[key] = value - counters.get(key, 0)
+        self.records.append(record)
+
+    def section(self, name):
+        return _Section(self, name)
+
+    def finish(self):
+        """结束当前部分；设置了 DT_PROFILE_LOG 时把本次运行的记录追加到该文件。"""
+        self.stop()
+        log_path = os.environ.get(PROFILE_LOG_ENV)
+        if self.enabled and log_path and self.records:
+            with open(log_path, 'a', encoding='utf-8') as f:
+                f.write(to_jsonl(self.records))
+        return self.records
+
+
+class _Section:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.start(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.stop()
+        return False
+
+
+def set_memory_tracing(session_id, enabled):
+    """登记会话是否需要内存记录。tracemalloc 是进程级的，只有所有仍在运行的会话都不需要时才停止。"""
+    now = time.monotonic()
+    with _tracing_lock:
+        if enabled:
+            _tracing_sessions[session_id] = now
+        else:
+            _tracing_sessions.pop(session_id, None)
+        # 会话关闭时不会再运行，登记超时后清除
+        for expired in [key for key, seen in _tracing_sessions.items() if now - seen > TRACING_TTL]:
+            del _tracing_sessions[expired]
+        if _tracing_sessions and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not _tracing_sessions and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def to_jsonl(records):
+    return ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
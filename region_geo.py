@@ -0,0 +1,79 @@
+"""地区名称到经纬度的离线对照。
+
+内置省级行政区和主要城市的代表坐标（省级使用省会/首府坐标），不依赖网络地理编码。
+地区名称按包含关系匹配，先匹配城市再匹配省份，兼容“广东省”“广东”“广东省深圳市”等写法。
+"""
+import pandas as pd
+
+# 省级行政区: (纬度, 经度)
+PROVINCE_CENTROIDS = {
+    '北京': (39.9042, 116.4074), '天津': (39.3434, 117.3616), '上海': (31.2304, 121.4737),
+    '重庆': (29.5630, 106.5516), '河北': (38.0428, 114.5149), '山西': (37.8706, 112.5489),
+    '内蒙古': (40.8424, 111.7490), '辽宁': (41.8057, 123.4315), '吉林': (43.8171, 125.3235),
+    '黑龙江': (45.8038, 126.5349), '江苏': (32.0603, 118.7969), '浙江': (30.2741, 120.1551),
+    '安徽': (31.8206, 117.2272), '福建': (26.0745, 119.2965), '江西': (28.6820, 115.8579),
+    '山东': (36.6512, 117.1201), '河南': (34.7466, 113.6254), '湖北': (30.5928, 114.3055),
+    '湖南': (28.2282, 112.9388), '广东': (23.1291, 113.2644), '广西': (22.8170, 108.3665),
+    '海南': (20.0440, 110.1999), '四川': (30.5728, 104.0668), '贵州': (26.6470, 106.6302),
+    '云南': (24.8801, 102.8329), '西藏': (29.6525, 91.1721), '陕西': (34.3416, 108.9398),
+    '甘肃': (36.0611, 103.8343), '青海': (36.6171, 101.7782), '宁夏': (38.4872, 106.2309),
+    '新疆': (43.8256, 87.6168), '香港': (22.3193, 114.1694), '澳门': (22.1987, 113.5439),
+    '台湾': (25.0330, 121.5654),
+}
+
+# 省会城市及上市公司较集中的城市: (纬度, 经度)
+CITY_CENTROIDS = {
+    '石家庄': (38.0428, 114.5149), '太原': (37.8706, 112.5489), '呼和浩特': (40.8424, 111.7490),
+    '沈阳': (41.8057, 123.4315), '长春': (43.8171, 125.3235), '哈尔滨': (45.8038, 126.5349),
+    '南京': (32.0603, 118.7969), '杭州': (30.2741, 120.1551), '合肥': (31.8206, 117.2272),
+    '福州': (26.0745, 119.2965), '南昌': (28.6820, 115.8579), '济南': (36.6512, 117.1201),
+    '郑州': (34.7466, 113.6254), '武汉': (30.5928, 114.3055), '长沙': (28.2282, 112.9388),
+    '广州': (23.1291, 113.2644), '南宁': (22.8170, 108.3665), '海口': (20.0440, 110.1999),
+    '成都': (30.5728, 104.0668), '贵阳': (26.6470, 106.6302), '昆明': (24.8801, 102.8329),
+    '拉萨': (29.6525, 91.1721), '西安': (34.3416, 108.9398), '兰州': (36.0611, 103.8343),
+    '西宁': (36.6171, 101.7782), '银川': (38.4872, 106.2309), '乌鲁木齐': (43.8256, 87.6168),
+    '台北': (25.0330, 121.5654),
+    '深圳': (22.5431, 114.0579), '苏州': (31.2989, 120.5853), '无锡': (31.4912, 120.3119),
+    '常州': (31.8107, 119.9741), '南通': (31.9802, 120.8943), '徐州': (34.2058, 117.2841),
+    '扬州': (32.3942, 119.4129), '镇江': (32.1878, 119.4250), '泰州': (32.4555, 119.9229),
+    '盐城': (33.3477, 120.1633), '宁波': (29.8683, 121.5440), '温州': (27.9938, 120.6994),
+    '绍兴': (30.0023, 120.5810), '嘉兴': (30.7461, 120.7555), '台州': (28.6564, 121.4208),
+    '金华': (29.0790, 119.6474), '湖州': (30.8943, 120.0868), '青岛': (36.0671, 120.3826),
+    '烟台': (37.4638, 121.4479), '潍坊': (36.7069, 119.1618), '淄博': (36.8131, 118.0548),
+    '大连': (38.9140, 121.6147), '鞍山': (41.1087, 122.9946), '厦门': (24.4798, 118.0894),
+    '泉州': (24.8741, 118.6757), '佛山': (23.0215, 113.1214), '东莞': (23.0207, 113.7518),
+    '珠海': (22.2710, 113.5767), '中山': (22.5176, 113.3926), '汕头': (23.3541, 116.6819),
+    '惠州': (23.1115, 114.4152), '江门': (22.5787, 113.0819), '洛阳': (34.6197, 112.4540),
+    '宜昌': (30.6919, 111.2865), '襄阳': (32.0090, 112.1226), '株洲': (27.8274, 113.1340),
+    '芜湖': (31.3525, 118.4331), '唐山': (39.6305, 118.1802), '包头': (40.6574, 109.8403),
+    '绵阳': (31.4675, 104.6796), '桂林': (25.2736, 110.2900), '柳州': (24.3264, 109.4281),
+    '三亚': (18.2528, 109.5119),
+}
+
+# 名称较长的优先匹配，避免短名称误命中
+_CITY_NAMES = sorted(CITY_CENTROIDS, key=len, reverse=True)
+_PROVINCE_NAMES = sorted(PROVINCE_CENTROIDS, key=len, reverse=True)
+
+
+def locate_region(name):
+    """返回地区名称对应的 (纬度, 经度)，无法识别时返回 None。"""
+    if pd.isna(name):
+        return None
+    name = str(name).strip()
+    for city in _CITY_NAMES:
+        if city in name:
+            return CITY_CENTROIDS[city]
+    for province in _PROVINCE_NAMES:
+        if province in name:
+            return PROVINCE_CENTROIDS[province]
+    return None
+
+
+def attach_coordinates(region_stats, region_col):
+    """为地区统计表增加 纬度、经度 列，无法识别的地区坐标为空。"""
+    # category 列的 map 会按类别返回元组索引，先转为普通对象列
+    located = region_stats[region_col].astype(object).map(locate_region)
+    result = region_stats.copy()
+    result['纬度'] = located.map(lambda point: point[0] if point else None).astype(float)
+    result['经度'] = located.map(lambda point: point[1] if point else None).astype(float)
+    return result
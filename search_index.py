@@ -0,0 +1,169 @@
+"""侧边栏企业搜索用的索引（股票代码、企业名称、拼音首字母）。
+
+每个数据集版本构建一次：股票代码（含补零到 6 位的写法）、企业历年用过的名称和名称的拼音首字母
+分别放入前缀树，名称的单字和相邻两字再建倒排索引，用于匹配名称中间的片段。
+搜索时按 完全匹配、代码前缀、名称前缀、曾用名前缀、拼音首字母前缀、名称包含、部分字符匹配 的顺序取前若干个结果，
+选择框只需要放这些结果，不必把全部股票代码发送到浏览器。
+拼音首字母需要安装 pypinyin，未安装时只按代码和名称搜索。
+"""
+import unicodedata
+
+try:
+    from pypinyin import Style, lazy_pinyin
+    HAS_PYPINYIN = True
+except ImportError:
+    HAS_PYPINYIN = False
+
+SEARCH_LIMIT = 20
+# 前缀树只建到该深度，更长的查询由“名称包含”一档匹配
+TRIE_DEPTH = 8
+# 前缀树节点中保存条目编号的键（单个字符不会是空串）
+_ITEMS = ''
+
+
+def normalize(text):
+    """统一全角/半角和大小写，去掉空白。"""
+    return ''.join(unicodedata.normalize('NFKC', str(text)).lower().split())
+
+
+def pinyin_initials(text):
+    if not HAS_PYPINYIN:
+        return ''
+    return normalize(''.join(lazy_pinyin(text, style=Style.FIRST_LETTER)))
+
+
+def ngrams(text):
+    """单字和相邻两字。"""
+    return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class PrefixTrie:
+    """前缀树：每个节点按插入顺序记录经过该节点的条目编号。"""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, key, item):
+        node = self.root
+        for char in key[:TRIE_DEPTH]:
+            node = node.setdefault(char, {})
+            items = node.setdefault(_ITEMS, [])
+            if not items or items[-1] != item:
+                items.append(item)
+
+    def find(self, prefix):
+        if len(prefix) > TRIE_DEPTH:
+            return []
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node.get(_ITEMS, [])
+
+
+def company_names(frame):
+    """各股票代码历年用过的企业名称，按出现的年数从多到少排列（第一个用于显示）。"""
+    counts = frame.groupby(['股票代码', '企业名称'], observed=True, sort=False).size()
+    counts = counts.sort_values(ascending=False, kind='stable')
+    names = {}
+    for (code, name), _ in counts.items():
+        names.setdefault(code, []).append(str(name))
+    return names
+
+
+class CompanySearchIndex:
+    def __init__(self, codes, names):
+        self.codes = list(codes)
+        self.code_rows = {code: i for i, code in enumerate(self.codes)}
+        # 选择框中显示使用年数最多的名称
+        self.names = {code: names[code][0] for code in self.codes if names.get(code)}
+        self.exact = {}
+        self.code_trie = PrefixTrie()
+        self.name_trie = PrefixTrie()
+        self.former_name_trie = PrefixTrie()
+        self.initials_trie = PrefixTrie()
+        self.ngram_index = {}
+        self.name_keys = []
+
+        entries = []
+        for i, code in enumerate(self.codes):
+            code_keys = list(dict.fromkeys([normalize(code), normalize(code).zfill(6)]))
+            for key in code_keys:
+                self.code_trie.insert(key, i)
+            name_keys = list(dict.fromkeys(normalize(name) for name in names.get(code, [])))
+            initials = list(dict.fromkeys(filter(None, (pinyin_initials(name) for name in names.get(code, [])))))
+            self.name_keys.append(name_keys)
+            for key in code_keys + name_keys:
+                self.exact.setdefault(key, []).append(i)
+            for key in name_keys:
+                for gram in ngrams(key):
+                    self.ngram_index.setdefault(gram, set()).add(i)
+            entries.append((len(name_keys[0]) if name_keys else 0, i, name_keys, initials))
+
+        # 显示的名称越短与查询越接近，按其长度插入，前缀树节点中的条目即按长度排好序
+        for _, i, name_keys, initials in sorted(entries):
+            for n, key in enumerate(name_keys):
+                (self.former_name_trie if n else self.name_trie).insert(key, i)
+            for key in initials:
+                self.initials_trie.insert(key, i)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, stock_code):
+        return stock_code in self.code_rows
+
+    def label(self, stock_code):
+        """用于选择框的 “股票代码 企业名称”。"""
+        return f'{stock_code} {self.names.get(stock_code, "")}'.strip()
+
+    def _name_order(self, i, query=''):
+        # 显示的名称中包含查询串的排在前面，其次名称越短越靠前
+        display = self.name_keys[i][0] if self.name_keys[i] else ''
+        return query not in display, len(display), i
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """按相关程度返回最多 limit 个股票代码。"""
+        query = normalize(query)
+        if not query:
+            return []
+        results = []
+        seen = set()
+
+        def take(items):
+            for i in items:
+                if i not in seen:
+                    seen.add(i)
+                    results.append(i)
+                    if len(results) >= limit:
+                        return True
+            return False
+
+        if (take(self.exact.get(query, [])) or take(self.code_trie.find(query))
+                or take(self.name_trie.find(query)) or take(self.former_name_trie.find(query))
+                or take(self.initials_trie.find(query))):
+            return [self.codes[i] for i in results]
+
+        # 名称中间包含查询串：用查询的单字/两字倒排表取交集后逐个确认
+        grams = [query] if len(query) == 1 else [query[i:i + 2] for i in range(len(query) - 1)]
+        postings = sorted((self.ngram_index.get(gram, set()) for gram in grams), key=len)
+        candidates = set.intersection(*postings) if postings[0] else set()
+        contains = [i for i in candidates if any(query in key for key in self.name_keys[i])]
+        # 纯数字的查询按代码搜索，不再做部分字符匹配
+        if take(sorted(contains, key=lambda i: self._name_order(i, query))) or len(grams) < 2 or query.isdigit():
+            return [self.codes[i] for i in results]
+
+        # 部分字符匹配：命中的两字片段不少于一半，按命中数排序
+        hits = {}
+        for gram in set(grams):
+            for i in self.ngram_index.get(gram, ()):
+                hits[i] = hits.get(i, 0) + 1
+        required = (len(set(grams)) + 1) // 2
+        partial = [i for i, count in hits.items() if count >= required]
+        take(sorted(partial, key=lambda i: (-hits[i],) + self._name_order(i)))
+        return [self.codes[i] for i in results]
+
+
+def build_search_index(stock_index):
+    return CompanySearchIndex(stock_index.codes, company_names(stock_index.frame))
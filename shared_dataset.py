@@ -0,0 +1,114 @@
+"""多个服务进程共享的只读数据集。
+
+负载均衡后面运行多个 Streamlit 服务进程时，每个进程各自读取缓存会各持有一份完整的主表。
+开启共享模式（环境变量 DT_SHARED_DATASET=1）后，第一个进程把压缩后的主表按 (股票代码, 年份) 排序，
+以未压缩的 Arrow IPC 文件发布到缓存目录，所有进程再以内存映射方式只读挂载：
+数值列直接引用映射的页面（零拷贝，由操作系统的页缓存在进程间共享），
+只有 category 列的类别表在各进程中各有一份。之后启动的进程只读取一个很小的 JSON 说明文件和挂载，
+不再解析工作簿、读取 Parquet 或排序。
+
+发布的文件按数据集版本命名，数据源变化后发布新文件，旧文件在不再使用后删除
+（已挂载旧文件的进程不受影响；Windows 上仍被映射的文件无法删除，下次发布时再删除）。
+"""
+import glob
+import os
+
+import numpy as np
+
+from analysis import load_dataset
+from data_cache import cache_dir_for, read_meta, write_meta
+from schema_inspector import source_fingerprint
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+SHARED_ENV = 'DT_SHARED_DATASET'
+SHARED_FORMAT_VERSION = 1
+SORT_COLUMNS = ['股票代码', '年份']
+
+
+def shared_mode_enabled():
+    return HAS_PYARROW and os.environ.get(SHARED_ENV, '') not in ('', '0')
+
+
+def shared_base(source):
+    return os.path.join(cache_dir_for(source), os.path.basename(os.path.normpath(source)) + '.shared')
+
+
+def source_state(source):
+    """数据源各文件的 mtime 和大小，用于判断已发布的数据集是否仍然有效（不计算哈希）。"""
+    return source_fingerprint(source)
+
+
+def to_arrow_array(series):
+    # numpy 数值列的 NaN 保留为浮点值而不是转成 null，挂载时才能零拷贝；
+    # category 列转为字典数组，字符串等其他列按 pandas 的缺失值语义转换
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biuf':
+        return pa.array(series.to_numpy(), from_pandas=False)
+    return pa.array(series, from_pandas=True)
+
+
+def to_arrow_table(df):
+    arrays = [to_arrow_array(df[col]) for col in df.columns]
+    return pa.Table.from_arrays(arrays, names=[str(col) for col in df.columns])
+
+
+def publish_dataset(source, df, meta):
+    """把主表写为内存映射用的 Arrow 文件并写出说明文件，返回说明信息。"""
+    version = meta['source']['sha256'][:16]
+    base = shared_base(source)
+    arrow_path = f'{base}.{version}.arrow'
+    if not os.path.exists(arrow_path):
+        frame = df.sort_values(SORT_COLUMNS, kind='stable').reset_index(drop=True)
+        os.makedirs(os.path.dirname(arrow_path), exist_ok=True)
+        tmp_path = f'{arrow_path}.{os.getpid()}.tmp'
+        table = to_arrow_table(frame)
+        # 不压缩，挂载后各列直接引用文件中的数据
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, arrow_path)
+
+    info = {
+        'format_version': SHARED_FORMAT_VERSION,
+        'source': source_state(source),
+        'arrow': os.path.basename(arrow_path),
+        'meta': meta,
+    }
+    write_meta(base + '.json', info)
+    remove_stale(source, keep=arrow_path)
+    return info
+
+
+def remove_stale(source, keep):
+    for path in glob.glob(glob.escape(shared_base(source)) + '.*.arrow'):
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def attach_dataset(arrow_path):
+    """以内存映射方式只读挂载，返回的 DataFrame 中数值列不可写。"""
+    source = pa.memory_map(arrow_path, 'r')
+    table = ipc.open_file(source).read_all()
+    # split_blocks 让每列各自成块，避免 pandas 合并同类型列时复制数据
+    return table.to_pandas(split_blocks=True)
+
+
+def load_shared_dataset(source):
+    """读取已发布的共享数据集；未发布或数据源已变化时读取缓存并发布。返回 (DataFrame, 缓存元数据)。"""
+    base = shared_base(source)
+    info = read_meta(base + '.json')
+    if (info is None or info.get('format_version') != SHARED_FORMAT_VERSION
+            or info.get('source') != source_state(source)
+            or not os.path.exists(os.path.join(os.path.dirname(base), info['arrow']))):
+        df, meta = load_dataset(source)
+        info = publish_dataset(source, df, meta)
+        del df
+    return attach_dataset(os.path.join(os.path.dirname(base), info['arrow'])), info['meta']
@@ -0,0 +1,84 @@
+"""按股票代码和 (股票代码, 年份) 的查询索引。
+
+数据集加载后按 (股票代码, 年份) 排序一次，记录每家企业在排序结果中的起止位置。
+查询企业历年数据只需按位置切片，查询某一年的数据在该企业的年份切片内二分定位，
+不再对整张表做布尔过滤和排序。
+数据源为按年份分区的数据目录时，企业历年数据改为从分区存储中只读取该企业所在年份的分区，
+最近查询过的企业保留在缓存中。
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# 分区存储模式下缓存的企业历年数据份数
+HISTORY_CACHE_SIZE = 32
+
+
+def is_sorted(df):
+    """是否已按 (股票代码, 年份) 排序（category 列按类别顺序比较，与 sort_values 一致）。"""
+    codes = df['股票代码']
+    codes = codes.cat.codes.to_numpy() if isinstance(codes.dtype, pd.CategoricalDtype) else codes.to_numpy()
+    years = df['年份'].to_numpy()
+    if len(codes) < 2:
+        return True
+    try:
+        same = codes[1:] == codes[:-1]
+        return bool(np.all((codes[1:] > codes[:-1]) | (same & (years[1:] >= years[:-1]))))
+    except TypeError:
+        return False
+
+
+class StockIndex:
+    def __init__(self, df, store=None):
+        # 稳定排序，保留原始行索引以便展示；已经有序时（如共享数据集）直接引用，不复制
+        self.frame = df if is_sorted(df) else df.sort_values(['股票代码', '年份'], kind='stable')
+        codes = self.frame['股票代码'].to_numpy()
+        self.years = self.frame['年份'].to_numpy()
+
+        if len(codes):
+            starts = np.concatenate([[0], np.flatnonzero(codes[1:] != codes[:-1]) + 1])
+        else:
+            starts = np.array([], dtype=np.int64)
+        stops = np.append(starts[1:], len(codes))
+        self.codes = codes[starts].tolist()
+        self.offsets = dict(zip(self.codes, zip(starts.tolist(), stops.tolist())))
+        self.store = store
+        if store is not None:
+            self._read_history = lru_cache(maxsize=HISTORY_CACHE_SIZE)(self._read_history)
+
+    def __contains__(self, stock_code):
+        return stock_code in self.offsets
+
+    def _bounds(self, stock_code):
+        return self.offsets.get(stock_code, (0, 0))
+
+    def history(self, stock_code):
+        """企业历年数据（按年份排序）。"""
+        if self.store is not None:
+            return self._read_history(stock_code)
+        start, stop = self._bounds(stock_code)
+        return self.frame.iloc[start:stop]
+
+    def _read_history(self, stock_code):
+        # 只读取该企业所在年份的分区，列和类型与常驻主表一致
+        start, stop = self._bounds(stock_code)
+        years = sorted(set(self.years[start:stop].tolist()))
+        frame = self.store.history(stock_code, list(self.frame.columns), years)
+        frame = frame.sort_values('年份', kind='stable').reset_index(drop=True)
+        return frame.astype(self.frame.dtypes.to_dict())
+
+    def position(self, stock_code, year):
+        """(股票代码, 年份) 在排序后表中的行位置，不存在时返回 None。"""
+        start, stop = self._bounds(stock_code)
+        pos = start + int(np.searchsorted(self.years[start:stop], year))
+        if pos < stop and self.years[pos] == year:
+            return pos
+        return None
+
+    def row(self, stock_code, year):
+        """企业某一年的数据，返回最多一行的DataFrame。"""
+        pos = self.position(stock_code, year)
+        if pos is None:
+            return self.frame.iloc[0:0]
+        return self.frame.iloc[pos:pos + 1]
@@ -0,0 +1,139 @@
+"""每家企业的指数趋势：同比变化、年均复合增长率、滚动均值和结构突变标记。
+
+在企业 × 年份矩阵（见 company_pivot.py）上按列向量化计算，每个数据集版本计算一次。
+矩阵先扩展到连续的自然年份，缺失的年份为 NaN：同比变化只在相邻两年都有数据时计算，
+滚动均值按自然年份的窗口计算，年均复合增长率按首末两条记录实际相隔的年数计算。
+结构突变为与该企业同比变化的中位数相差超过 BREAK_THRESHOLD 倍稳健标准差（1.4826 × MAD）的年份。
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+ROLLING_WINDOW = 3
+ROLLING_MIN_PERIODS = 2
+BREAK_THRESHOLD = 3.0
+# 同比变化少于该数量的企业不标记结构突变
+BREAK_MIN_CHANGES = 4
+# 首末记录相隔不足该年数的企业不参与全市场趋势排行
+MIN_TREND_YEARS = 3
+
+CAGR_COLUMN = '年均复合增长率(%)'
+SUMMARY_COLUMNS = ['企业名称', '起始年份', '最新年份', '起始指数', '最新指数', CAGR_COLUMN,
+                   '最新同比变化', '平均同比变化', '结构突变次数', '最近突变年份']
+
+
+def _nanmedian(values, axis):
+    # 全为 NaN 的行返回 NaN，不发出警告
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmedian(values, axis=axis)
+
+
+def _years(years, mask):
+    # 可空的整数年份
+    return pd.array(np.where(mask, years, np.nan), dtype='Int32')
+
+
+def rolling_mean(matrix, window=ROLLING_WINDOW, min_periods=ROLLING_MIN_PERIODS):
+    """沿年份方向的滚动均值（窗口内非空值不少于 min_periods 时计算）。"""
+    valid = np.isfinite(matrix)
+    sums = np.cumsum(np.where(valid, matrix, 0.0), axis=1)
+    counts = np.cumsum(valid, axis=1)
+    sums[:, window:] = sums[:, window:] - sums[:, :-window].copy()
+    counts[:, window:] = counts[:, window:] - counts[:, :-window].copy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts >= min_periods, sums / counts, np.nan)
+
+
+def break_flags(changes, threshold=BREAK_THRESHOLD, min_changes=BREAK_MIN_CHANGES):
+    """同比变化偏离该企业中位数超过 threshold 倍稳健标准差的位置；MAD 为 0 时改用全市场的稳健标准差。"""
+    median = _nanmedian(changes, axis=1)[:, None]
+    deviation = np.abs(changes - median)
+    scale = 1.4826 * _nanmedian(deviation, axis=1)[:, None]
+    market_scale = 1.4826 * _nanmedian(np.abs(changes - _nanmedian(changes, axis=None)), axis=None)
+    scale = np.where(scale > 0, scale, market_scale)
+    enough = (np.isfinite(changes).sum(axis=1) >= min_changes)[:, None]
+    with np.errstate(invalid='ignore'):
+        return enough & (deviation > threshold * scale)
+
+
+class CompanyTrends:
+    def __init__(self, pivot, index_col):
+        self.index_col = index_col
+        self.codes = pivot.codes
+        self.code_rows = pivot.code_rows
+        years = np.asarray(pivot.years, dtype=np.int64)
+        # 扩展到连续的自然年份，整年都没有数据的年份也占一列
+        self.years = np.arange(years.min(), years.max() + 1)
+        self.values = np.full((len(self.codes), len(self.years)), np.nan)
+        self.values[:, years - self.years[0]] = pivot.matrices[index_col]
+
+        # 第 j 列为 第 j 年 相对 第 j-1 年 的变化，首列为 NaN
+        previous = np.full_like(self.values, np.nan)
+        previous[:, 1:] = self.values[:, :-1]
+        self.changes = self.values - previous
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.growth = np.where(previous > 0, self.changes / previous * 100, np.nan)
+        self.rolling = rolling_mean(self.values)
+        self.breaks = break_flags(self.changes)
+        self.summary = self._summarize(pivot)
+
+    def _summarize(self, pivot):
+        valid = np.isfinite(self.values)
+        rows = np.arange(len(self.codes))
+        first = np.argmax(valid, axis=1)
+        last = len(self.years) - 1 - np.argmax(valid[:, ::-1], axis=1)
+        first_values, last_values = self.values[rows, first], self.values[rows, last]
+        span = (self.years[last] - self.years[first]).astype(np.float64)
+        changed = np.isfinite(self.changes)
+        change_counts = changed.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cagr = np.where((first_values > 0) & (last_values > 0) & (span > 0),
+                            ((last_values / first_values) ** (1 / span) - 1) * 100, np.nan)
+            mean_change = np.where(change_counts > 0,
+                                   np.where(changed, self.changes, 0.0).sum(axis=1) / change_counts, np.nan)
+        break_years = np.where(self.breaks, self.years[None, :], -1).max(axis=1)
+
+        has_data = valid.any(axis=1)
+        return pd.DataFrame({
+            '企业名称': [pivot.names.get(code, '') for code in self.codes],
+            '起始年份': _years(self.years[first], has_data),
+            '最新年份': _years(self.years[last], has_data),
+            '起始指数': first_values,
+            '最新指数': last_values,
+            CAGR_COLUMN: cagr,
+            '最新同比变化': self.changes[rows, last],
+            '平均同比变化': mean_change,
+            '结构突变次数': self.breaks.sum(axis=1).astype(np.int32),
+            '最近突变年份': _years(break_years, break_years >= 0),
+        }, index=pd.Index(self.codes, name='股票代码'), columns=SUMMARY_COLUMNS)
+
+    def history(self, stock_code):
+        """企业历年的指数和趋势指标，只列出有指数的年份。"""
+        if stock_code not in self.code_rows:
+            return pd.DataFrame(columns=['年份', self.index_col, '同比变化', '同比增长率(%)',
+                                         f'{ROLLING_WINDOW}年滚动均值', '结构突变'])
+        row = self.code_rows[stock_code]
+        present = np.isfinite(self.values[row])
+        return pd.DataFrame({
+            '年份': self.years[present],
+            self.index_col: self.values[row, present],
+            '同比变化': self.changes[row, present],
+            '同比增长率(%)': self.growth[row, present],
+            f'{ROLLING_WINDOW}年滚动均值': self.rolling[row, present],
+            '结构突变': self.breaks[row, present],
+        })
+
+    def company_summary(self, stock_code):
+        """企业的趋势汇总（一行），不存在时返回 None。"""
+        if stock_code not in self.code_rows:
+            return None
+        return self.summary.iloc[self.code_rows[stock_code]]
+
+    def top_movers(self, k=10, by=CAGR_COLUMN, ascending=False, min_years=MIN_TREND_YEARS):
+        """全市场按 by 排序的前 k 家企业（默认为增长最快的；ascending=True 为下降最快的）。"""
+        summary = self.summary
+        eligible = summary[(summary['最新年份'] - summary['起始年份'] >= min_years).fillna(False)
+                           & summary[by].notna()]
+        return eligible.nsmallest(k, by) if ascending else eligible.nlargest(k, by)
@@ -1,56 +1,42 @@
-import pandas as pd
 import os
+import sys
 
-# 检查文件是否存在
-file_path = '两版合并后的年报数据_完整版.xlsx'
+from schema_inspector import load_manifest
+
+# 检查文件是否存在（也可以在命令行中指定工作簿或数据目录）
+file_path = sys.argv[1] if len(sys.argv) > 1 else '两版合并后的年报数据_完整版.xlsx'
 if os.path.exists(file_path):
     print(f"文件存在: {file_path}")
     
-    # 读取Excel文件的前10行数据
-    df = pd.read_excel(file_path, nrows=10)
-    
-    # 显示所有列名
-    print("\nExcel文件的列名:")
-    for i, col in enumerate(df.columns, 1):
-        print(f"{i}. {col}")
-    
-    # 显示数据类型
-    print("\n各列的数据类型:")
-    print(df.dtypes)
-    
-    # 显示前5行数据
-    print("\n前5行数据预览:")
-    print(df.head())
-    
-    # 显示基本统计信息
-    print("\n数据基本统计信息:")
-    print(df.describe(include='all'))
-    
-    # 检查是否有'企业名称'列
-    if '企业名称' in df.columns:
-        print("\n企业数量:", df['企业名称'].nunique())
-    
-    # 检查是否有'年份'列
-    if '年份' in df.columns:
-        print("\n年份范围:", df['年份'].min(), "-", df['年份'].max())
-    
-    # 检查是否有包含'数字化'、'转型'或'指数'的列
-    index_columns = [col for col in df.columns if any(keyword in col for keyword in ['数字化', '转型', '指数'])]
-    if index_columns:
-        print("\n数字化转型相关列:", index_columns)
-    
-    # 检查是否有行业相关列
-    industry_columns = [col for col in df.columns if any(keyword in col for keyword in ['行业', '产业', '所属行业'])]
-    if industry_columns:
-        print("\n行业相关列:", industry_columns)
-        print("行业类别:", df[industry_columns[0]].unique())
-    
-    # 检查是否有地区相关列
-    region_columns = [col for col in df.columns if any(keyword in col for keyword in ['地区', '省份', '城市', '地域', '区域'])]
-    if region_columns:
-        print("\n地区相关列:", region_columns)
-        print("地区类别:", df[region_columns[0]].unique()[:10])  # 只显示前10个
+    # 流式读取表头和样本行，生成并保存数据源清单
+    manifest = load_manifest(file_path, refresh=True)
+    print(f"检查耗时: {manifest['elapsed_ms']} ms，总行数: {manifest['row_count']}")
+    
+    # 显示所有列名及样本推断的类型、缺失比例、唯一值数和取值范围
+    sampled_rows = sum(file_info['sampled_rows'] for file_info in manifest['files'])
+    print(f"\nExcel文件的列信息（基于在整个工作表中均匀抽取的 {sampled_rows} 行样本）:")
+    truncated = [file_info['sheet'] for file_info in manifest['files'] if file_info.get('scan_truncated')]
+    if truncated:
+        print(f"（以下工作表较大，样本只取自前面的部分: {', '.join(truncated)}）")
+    for i, column in enumerate(manifest['columns'], 1):
+        details = f"类型: {column['dtype']}  缺失: {column['null_ratio']:.1%}  唯一值: {column['unique']}"
+        if 'min' in column:
+            details += f"  范围: {column['min']} - {column['max']}"
+        if 'mean_length' in column:
+            details += f"  平均长度: {column['mean_length']}"
+        print(f"{i}. {column['name']}  {details}")
+    
+    # 缺少的必要列
+    if manifest['missing_required']:
+        print("\n缺少必要的列:", manifest['missing_required'])
+    
+    # 识别出的指数列、地区列、行业列和文本列
+    roles = manifest['roles']
+    print("\n数字化转型相关列:", roles['index_columns'])
+    print("行业相关列:", roles['industry_col'])
+    print("地区相关列:", roles['region_col'])
+    print("文本内容列:", roles['text_col'])
 else:
     print(f"文件不存在: {file_path}")
     print("当前工作目录:", os.getcwd())
-    print("当前目录下的文件:", os.listdir('.'))
\ No newline at end of file
+    print("当前目录下的文件:", os.listdir('.'))